@@ -10,6 +10,11 @@ from simple_history.admin import SimpleHistoryAdmin
 from django.utils import timezone
 from django import forms
 from django.utils.html import format_html
+from django.urls import path
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+from django.utils.decorators import method_decorator
+from .rendering import render_markdown
 from unfold.contrib.filters.admin import (
     RangeDateFilter,
     RelatedDropdownFilter,
@@ -126,7 +131,7 @@ class PostAdmin(UnfoldHistoryAdmin):
     autocomplete_fields = ['category', 'tags']
 
     # 只读
-    readonly_fields = ["views", "updated_at_display", "published_at_display"]
+    readonly_fields = ["views", "word_count", "reading_time", "updated_at_display", "published_at_display"]
 
     # 选择框
     radio_fields = {"status": admin.HORIZONTAL}
@@ -134,7 +139,7 @@ class PostAdmin(UnfoldHistoryAdmin):
     # 详情页
     fieldsets = (
         ("基本信息", {
-            "fields": (("title", "slug"), ("category", "tags"),"excerpt","password","status","published_at_display","updated_at_display"),
+            "fields": (("title", "slug"), ("category", "tags"),"excerpt","password","status","published_at_display","updated_at_display",("word_count", "reading_time")),
             "classes": ("tab",),
         }),
         ("内容创作", {
@@ -245,6 +250,23 @@ class PostAdmin(UnfoldHistoryAdmin):
             obj.author = request.user
         super().save_model(request, obj, form, change)
 
+    def get_urls(self):
+        urls = [
+            path("preview/", self.admin_site.admin_view(self.markdown_preview_view), name="blog_post_preview"),
+        ]
+        return urls + super().get_urls()
+
+    @method_decorator(require_POST)
+    def markdown_preview_view(self, request):
+        """
+        编辑器实时预览：与前台同一套渲染，复用已缓存的块，每次只重新渲染改动的块
+        预览产生的块大多是中间稿，只短期缓存 (POST_PREVIEW_BLOCK)
+        """
+        if not self.has_change_permission(request) and not self.has_add_permission(request):
+            return JsonResponse({'error': '没有权限'}, status=403)
+        rendered = render_markdown(request.POST.get('content', ''), timeout_key="POST_PREVIEW_BLOCK")
+        return JsonResponse({'html': rendered['html']})
+
 
     class Media:
         css = {
@@ -252,4 +274,7 @@ class PostAdmin(UnfoldHistoryAdmin):
                 "admin/css/admin_extra.css",
             )
         }
+        js = (
+            "admin/js/admin_markdown_preview.js",
+        )
 
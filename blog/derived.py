@@ -0,0 +1,75 @@
+# blog/derived.py
+"""
+文章派生字段：由 Markdown 正文算出，保存时写入数据库
+列表页只需要这些字段，不必读取 (也不必解析) 整篇正文
+
+- excerpt: 摘要留空时取正文开头的纯文本
+- word_count: 中日韩字符每字计 1，其余按空白 / 标点分隔的单词计
+- reading_time: 按 中文 400 字/分钟、英文 200 词/分钟 估算，向上取整，至少 1 分钟
+- has_math / has_code: 正文中是否有公式 / 围栏代码块
+"""
+import math
+import re
+
+EXCERPT_LENGTH = 150
+CJK_CHARS_PER_MINUTE = 400
+WORDS_PER_MINUTE = 200
+
+FENCED_CODE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})[^\n]*\n.*?(^ {0,3}\1[ \t]*$|\Z)', re.MULTILINE | re.DOTALL)
+INLINE_CODE_RE = re.compile(r'(`+)(.+?)\1', re.DOTALL)
+# 与 pymdownx.arithmatex (generic 模式) 的默认语法保持一致：$$...$$、\[...\]、$...$、\(...\)
+BLOCK_MATH_RE = re.compile(r'\$\$.+?\$\$|\\\[.+?\\\]', re.DOTALL)
+INLINE_MATH_RE = re.compile(r'(?<![\\$])\$(?!\s)[^$\n]+?(?<![\s\\])\$(?!\d)|\\\(.+?\\\)')
+IMAGE_RE = re.compile(r'!\[([^\]]*)\]\([^)]*\)')
+LINK_RE = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+LINE_MARKUP_RE = re.compile(r'^ {0,3}(#{1,6}\s+|>\s?|[*+-]\s+|\d+[.)]\s+|[-*_]{3,}\s*$|\|)', re.MULTILINE)
+EMPHASIS_RE = re.compile(r'\*+|~~|(?<!\w)_+|_+(?!\w)')
+CJK_RE = re.compile(r'[぀-ヿ㐀-䶿一-鿿豈-﫿가-힯]')
+WORD_RE = re.compile(r"[^\W぀-ヿ㐀-䶿一-鿿豈-﫿가-힯]+(?:['’-]\w+)*")
+
+
+def _strip_markup(text):
+    """去掉 Markdown 语法，只留下可读文字 (链接 / 图片保留文字部分)"""
+    text = IMAGE_RE.sub(r'\1', text)
+    text = LINK_RE.sub(r'\1', text)
+    text = HTML_TAG_RE.sub(' ', text)
+    text = LINE_MARKUP_RE.sub('', text)
+    return EMPHASIS_RE.sub('', text).replace('|', ' ')
+
+
+def make_excerpt(content, length=EXCERPT_LENGTH):
+    """正文开头的纯文本，跳过代码块和公式"""
+    text = FENCED_CODE_RE.sub(' ', content.replace('\r\n', '\n'))
+    text = BLOCK_MATH_RE.sub(' ', text)
+    text = INLINE_MATH_RE.sub(' ', text)
+    text = INLINE_CODE_RE.sub(r'\2', text)
+    text = ' '.join(_strip_markup(text).split())
+    if len(text) <= length:
+        return text
+    return text[:length].rstrip() + '…'
+
+
+def has_math(content):
+    text = INLINE_CODE_RE.sub(' ', FENCED_CODE_RE.sub(' ', content.replace('\r\n', '\n')))
+    return bool(BLOCK_MATH_RE.search(text) or INLINE_MATH_RE.search(text))
+
+
+def has_code(content):
+    """只看围栏代码块 (行内代码不经过 Pygments 高亮)"""
+    return bool(FENCED_CODE_RE.search(content.replace('\r\n', '\n')))
+
+
+def derive_fields(content):
+    """返回 {"excerpt", "word_count", "reading_time", "has_math", "has_code"}"""
+    text = _strip_markup(content)
+    cjk = len(CJK_RE.findall(text))
+    words = len(WORD_RE.findall(text))
+    minutes = cjk / CJK_CHARS_PER_MINUTE + words / WORDS_PER_MINUTE
+    return {
+        "excerpt": make_excerpt(content),
+        "word_count": cjk + words,
+        "reading_time": max(1, math.ceil(minutes)) if cjk + words else 0,
+        "has_math": has_math(content),
+        "has_code": has_code(content),
+    }
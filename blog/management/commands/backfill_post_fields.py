@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import DERIVED_FIELDS, Post
+from core.page_cache import bump_generation
+
+
+class Command(BaseCommand):
+    help = '为已有文章重新计算派生字段 (摘要 / 字数 / 阅读时长 / 是否含公式与代码)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='每批写回的文章数')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = ['id', 'content', *DERIVED_FIELDS]
+        batch, changed, total = [], 0, 0
+
+        # bulk_update 不触发 save / 信号，也不会为每篇文章生成一条历史记录
+        for post in Post.objects.only(*fields).order_by('id').iterator(chunk_size=batch_size):
+            total += 1
+            before = [getattr(post, field) for field in DERIVED_FIELDS]
+            post.refresh_derived_fields()
+            if [getattr(post, field) for field in DERIVED_FIELDS] != before:
+                batch.append(post)
+            if len(batch) >= batch_size:
+                changed += Post.objects.bulk_update(batch, DERIVED_FIELDS)
+                batch = []
+        if batch:
+            changed += Post.objects.bulk_update(batch, DERIVED_FIELDS)
+
+        if changed:
+            bump_generation()  # 列表页展示摘要 / 阅读时长，让整页缓存失效
+        self.stdout.write(self.style.SUCCESS(f"共 {total} 篇文章，更新 {changed} 篇"))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models.functions import Length
+
+from blog.models import Post
+from blog.rendering import get_rendered_post, render_markdown, warm_post
+from tools.judge_utils import summarize_samples
+
+
+class Command(BaseCommand):
+    help = '对最长的几篇文章，对比每次重新渲染 Markdown 与读取渲染缓存的耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=5, help='取正文最长的前 N 篇文章')
+        parser.add_argument('--repeat', type=int, default=20, help='每篇文章每种方式的执行次数')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.annotate(length=Length('content')).order_by('-length')[:options['top']]
+        repeat = options['repeat']
+
+        for post in posts:
+            render_samples, cached_samples = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                render_markdown(post.content)
+                render_samples.append((time.perf_counter() - start) * 1000)
+
+            warm_post(post)
+            for _ in range(repeat):
+                start = time.perf_counter()
+                get_rendered_post(post)
+                cached_samples.append((time.perf_counter() - start) * 1000)
+
+            render, cached = summarize_samples(render_samples), summarize_samples(cached_samples)
+            speedup = render['median'] / cached['median'] if cached['median'] else float('inf')
+            self.stdout.write(self.style.SUCCESS(
+                f"[{post.length:>7} 字] {post.title[:30]} | 渲染 median={render['median']:.2f}ms "
+                f"p90={render['p90']:.2f}ms | 缓存 median={cached['median']:.3f}ms | {speedup:.0f}x"
+            ))
@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-19 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_post_post_cat_status_pub_id_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalpost',
+            name='has_code',
+            field=models.BooleanField(default=False, editable=False, verbose_name='包含代码'),
+        ),
+        migrations.AddField(
+            model_name='historicalpost',
+            name='has_math',
+            field=models.BooleanField(default=False, editable=False, verbose_name='包含公式'),
+        ),
+        migrations.AddField(
+            model_name='historicalpost',
+            name='reading_time',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='阅读时长 (分钟)'),
+        ),
+        migrations.AddField(
+            model_name='historicalpost',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='字数'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='has_code',
+            field=models.BooleanField(default=False, editable=False, verbose_name='包含代码'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='has_math',
+            field=models.BooleanField(default=False, editable=False, verbose_name='包含公式'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='reading_time',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='阅读时长 (分钟)'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='字数'),
+        ),
+    ]
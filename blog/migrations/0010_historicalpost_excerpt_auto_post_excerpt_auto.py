@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_historicalpost_has_code_historicalpost_has_math_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalpost',
+            name='excerpt_auto',
+            field=models.BooleanField(default=False, editable=False, help_text='摘要由正文生成时，正文修改后随之更新', verbose_name='摘要自动生成'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt_auto',
+            field=models.BooleanField(default=False, editable=False, help_text='摘要由正文生成时，正文修改后随之更新', verbose_name='摘要自动生成'),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.utils.text import slugify
 from simple_history.models import HistoricalRecords
 from django.conf import settings
 
+from .derived import derive_fields
+
 ######################################################################
 # 分类
 ######################################################################
@@ -36,6 +38,7 @@ class Tag(models.Model):
 # 文章
 ######################################################################
 STATUS_CHOICES = (("draft", "草稿"),("published", "已发布"),)
+DERIVED_FIELDS = ("excerpt", "excerpt_auto", "word_count", "reading_time", "has_math", "has_code")
 class Post(models.Model):
     title = models.CharField(max_length=200, verbose_name="文章标题")
     slug = models.SlugField(unique=True, allow_unicode=True, verbose_name="URL别名", help_text="用于生成文章链接")
@@ -57,10 +60,27 @@ class Post(models.Model):
     views = models.PositiveIntegerField(default=0, verbose_name="阅读量")
     published_at = models.DateTimeField(null=True, blank=True, verbose_name="发布时间")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    # 派生字段：保存时由正文计算 (见 blog/derived.py)，列表页不用再读取正文
+    excerpt_auto = models.BooleanField(default=False, editable=False, verbose_name="摘要自动生成",
+                                       help_text="摘要由正文生成时，正文修改后随之更新")
+    word_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="字数")
+    reading_time = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name="阅读时长 (分钟)")
+    has_math = models.BooleanField(default=False, editable=False, verbose_name="包含公式")
+    has_code = models.BooleanField(default=False, editable=False, verbose_name="包含代码")
+
     class Meta:
         verbose_name = "文章"
         verbose_name_plural = verbose_name
         ordering = ['-published_at']
+        indexes = [
+            # 列表页游标分页 / 上下篇查询：status 过滤 + (published_at, id) 排序 (倒序时反向扫描索引)
+            models.Index(fields=['status', 'published_at', 'id'], name='post_status_pub_id_idx'),
+            # 按分类筛选的列表：分类 slug 先定位到 category_id，再按同样的顺序读取
+            models.Index(fields=['category', 'status', 'published_at', 'id'], name='post_cat_status_pub_id_idx'),
+            # 条件请求的校验值 MAX(updated_at)：直接读索引末端，不扫描整张表
+            models.Index(fields=['status', 'updated_at'], name='post_status_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -68,8 +88,41 @@ class Post(models.Model):
     def save(self, *args, **kwargs):
         if self.status == "published" and self.published_at is None:
             self.published_at = timezone.now()
+
+        # 只更新部分字段且不含正文时 (例如写回阅读量)，派生字段不会变，不用重新计算
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "content" in update_fields or "excerpt" in update_fields:
+            self.refresh_derived_fields()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *DERIVED_FIELDS}
         super().save(*args, **kwargs)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记下读出时的自动摘要：保存时摘要没被改动过，就说明仍是自动生成的，可以随正文更新
+        if instance.__dict__.get("excerpt_auto"):
+            instance._auto_excerpt = instance.__dict__.get("excerpt")
+        return instance
+
+    def refresh_derived_fields(self):
+        """
+        由正文重新计算派生字段
+        摘要留空、或者仍是上次自动生成的内容 (没被手动改过) 时重新生成；手写的摘要不覆盖
+        """
+        derived = derive_fields(self.content)
+        excerpt = self.excerpt.strip()
+        auto = (not excerpt
+                or self.excerpt == getattr(self, "_auto_excerpt", None)
+                or self.excerpt == derived["excerpt"])  # 与当前正文生成的一致 (含升级前生成的摘要)
+        if auto:
+            self._auto_excerpt = derived["excerpt"]
+        else:
+            derived.pop("excerpt")
+        derived["excerpt_auto"] = auto
+        for field, value in derived.items():
+            setattr(self, field, value)
+
     @property
     def is_encrypted(self):
         """判断文章是否加密"""
@@ -0,0 +1,129 @@
+# blog/navigation.py
+"""
+博客导航索引：列表页侧边栏的分类 / 标签计数、详情页的上一篇 / 下一篇
+这些数据只在文章发布、修改、删除时才会变，读取时不再查库，由 blog/signals.py 在变更后更新
+
+- 侧边栏：分类 / 标签及其已发布文章数，整体作为一个缓存值，变更时重新统计一次 (两条 GROUP BY)
+- 上下篇：已发布文章按 (published_at, id) 排在 Redis ZSET 里，score 为发布时间 (微秒)，
+  member 为补零的 id，同一时间发布的文章按 id 排序；slug / 标题存在 Hash 中
+  文章保存 / 删除时只增删这一篇 (ZADD / ZREM)，不重建整个索引
+- Redis 被清空等情况下索引不存在，第一次读取时从数据库整体重建
+"""
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django_redis import get_redis_connection
+
+from .models import Category, Post, Tag
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def _member(post_id):
+    return f"{post_id:012d}"
+
+
+def _score(published_at):
+    # 整数微秒，不经过浮点乘法，同一秒内发布的文章也能排出先后
+    return int(published_at.timestamp()) * 1_000_000 + published_at.microsecond
+
+
+def _meta(post):
+    return json.dumps({"slug": post.slug, "title": post.title}, ensure_ascii=False)
+
+
+######################################################################
+# 侧边栏
+######################################################################
+def compute_sidebar():
+    published = Q(post__status='published')
+    return {
+        "categories": list(Category.objects.annotate(post_count=Count('post', filter=published))
+                           .values('name', 'slug', 'post_count')),
+        "tags": list(Tag.objects.annotate(post_count=Count('post', filter=published))
+                     .values('name', 'slug', 'post_count')),
+    }
+
+
+def refresh_sidebar():
+    sidebar = compute_sidebar()
+    cache.set(settings.CACHE_KEYS["BLOG_SIDEBAR"], sidebar, timeout=None)
+    return sidebar
+
+
+def get_sidebar():
+    """{"categories": [{"name", "slug", "post_count"}], "tags": [...]}，计数只含已发布文章"""
+    sidebar = cache.get(settings.CACHE_KEYS["BLOG_SIDEBAR"])
+    if sidebar is None:
+        sidebar = refresh_sidebar()
+    return sidebar
+
+
+######################################################################
+# 上一篇 / 下一篇
+######################################################################
+def rebuild_neighbors():
+    """从数据库整体重建排序索引"""
+    posts = Post.objects.filter(status='published', published_at__isnull=False).only('id', 'slug', 'title',
+                                                                                     'published_at')
+    order_key, meta_key = settings.CACHE_KEYS["BLOG_NAV_ORDER"], settings.CACHE_KEYS["BLOG_NAV_META"]
+    pipe = _redis().pipeline(transaction=True)
+    pipe.delete(order_key, meta_key)
+    for post in posts.iterator(chunk_size=1000):
+        pipe.zadd(order_key, {_member(post.id): _score(post.published_at)})
+        pipe.hset(meta_key, _member(post.id), _meta(post))
+    pipe.set(settings.CACHE_KEYS["BLOG_NAV_BUILT"], 1)
+    pipe.execute()
+
+
+def sync_post(post):
+    """文章保存后：已发布则加入 / 更新索引，否则移出"""
+    order_key, meta_key = settings.CACHE_KEYS["BLOG_NAV_ORDER"], settings.CACHE_KEYS["BLOG_NAV_META"]
+    pipe = _redis().pipeline(transaction=True)
+    if post.status == 'published' and post.published_at:
+        pipe.zadd(order_key, {_member(post.id): _score(post.published_at)})
+        pipe.hset(meta_key, _member(post.id), _meta(post))
+    else:
+        pipe.zrem(order_key, _member(post.id))
+        pipe.hdel(meta_key, _member(post.id))
+    pipe.execute()
+
+
+def remove_post(post_id):
+    pipe = _redis().pipeline(transaction=True)
+    pipe.zrem(settings.CACHE_KEYS["BLOG_NAV_ORDER"], _member(post_id))
+    pipe.hdel(settings.CACHE_KEYS["BLOG_NAV_META"], _member(post_id))
+    pipe.execute()
+
+
+def get_neighbors(post):
+    """
+    返回 (prev_post, next_post)，各为 {"slug", "title"} 或 None
+    prev 是更早发布的一篇，next 是更晚发布的一篇
+    """
+    redis = _redis()
+    order_key = settings.CACHE_KEYS["BLOG_NAV_ORDER"]
+    pipe = redis.pipeline(transaction=False)
+    pipe.exists(settings.CACHE_KEYS["BLOG_NAV_BUILT"])
+    pipe.zrank(order_key, _member(post.id))
+    built, rank = pipe.execute()
+
+    if not built:
+        rebuild_neighbors()
+        rank = redis.zrank(order_key, _member(post.id))
+    if rank is None:
+        # 刚发布、信号还没来得及写入 (事务提交后才执行)：先补上这一篇
+        sync_post(post)
+        rank = redis.zrank(order_key, _member(post.id))
+        if rank is None:
+            return None, None
+
+    start = max(rank - 1, 0)
+    members = redis.zrange(order_key, start, rank + 1)
+    metas = redis.hmget(settings.CACHE_KEYS["BLOG_NAV_META"], members) if members else []
+    by_rank = {start + i: json.loads(meta) for i, meta in enumerate(metas) if meta}
+    return by_rank.get(rank - 1) if rank > 0 else None, by_rank.get(rank + 1)
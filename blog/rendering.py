@@ -0,0 +1,354 @@
+# blog/rendering.py
+"""
+文章 Markdown 渲染与缓存
+渲染结果 (HTML + TOC) 按 “正文哈希 + 渲染配置版本” 存入缓存：
+正文不变就一直命中，正文一改哈希随之变化，旧结果自然失效
+整篇未命中时按顶层块 (代码块 / 公式块 / 标题 / 段落组) 逐块渲染，每块单独缓存，
+改一段文字只会重新渲染这一段，其余代码块不用再跑一遍 Pygments
+渲染结果里同时记录页面需要的静态资源 (KaTeX)，没有公式的文章不加载它们
+代码高亮的 Monokai 配色已编译进 dist.css (static/src/input.css)，不需要按页面加载
+"""
+import hashlib
+import re
+
+import markdown
+from django.conf import settings
+from django.core.cache import cache
+from markdown.extensions.toc import nest_toc_tokens, unique
+
+# 修改下面的扩展或配置后必须 +1，让所有旧的渲染结果失效
+RENDER_VERSION = 4
+
+MARKDOWN_EXTENSIONS = [
+    'toc',
+    'tables',
+    'pymdownx.highlight',  # 替代 codehilite，代码高亮
+    'pymdownx.superfences',  # 替代 fenced_code，支持更好看的代码块
+    'pymdownx.arithmatex',  # 替代 mdx_math，修复数学公式渲染问题!!!
+]
+
+MARKDOWN_EXTENSION_CONFIGS = {
+    # 1. 修复数学公式的关键配置
+    'pymdownx.arithmatex': {
+        'generic': True,  # 开启通用模式，它会输出 \( ... \) 而不是 script 标签
+    },
+    # 2. 代码高亮配置
+    'pymdownx.highlight': {
+        'css_class': 'mockup-code w-full highlight',
+        'linenums': False,
+        'use_pygments': True,
+    },
+    # 3. 允许代码块嵌套
+    'pymdownx.superfences': {
+        "disable_indented_code_blocks": True
+    }
+}
+
+
+FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+HEADING_RE = re.compile(r'^ {0,3}#{1,6}(\s|$)')
+LIST_ITEM_RE = re.compile(r'^ {0,3}([*+-]|\d+[.)])\s')
+HTML_BLOCK_RE = re.compile(r'^ {0,3}<([a-zA-Z][\w-]*)')
+# 切分章节时用来跟踪嵌套深度的标签 (注释整体跳过)；自闭合 / 空元素不改变深度
+SECTION_TAG_RE = re.compile(r'<!--.*?-->|<(/?)([a-zA-Z][\w-]*)\b[^>]*?(/?)>', re.DOTALL)
+VOID_ELEMENTS = frozenset({'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                           'source', 'track', 'wbr'})
+HEADING_ID_RE = re.compile(r'<h[1-6][^>]*?\sid="([^"]*)"')
+# arithmatex (generic 模式) 输出 <span|div class="arithmatex">
+ARITHMATEX_RE = re.compile(r'<(?:span|div) class="arithmatex">')
+
+# 渲染后 HTML 超过该长度的文章按 h2 分章节，只直出前几章，其余滚动到附近时再加载
+LAZY_SECTIONS_MIN_LENGTH = 60000
+LAZY_SECTIONS_INLINE = 2
+
+# 这些语法会跨块生效 (引用式链接定义 / [TOC] 标记)，出现时整篇一起渲染
+WHOLE_DOCUMENT_RE = re.compile(r'^ {0,3}\[[^\]]+\]:|^\s*\[TOC\]\s*$', re.MULTILINE)
+
+
+def content_digest(content):
+    return hashlib.sha256(f"{RENDER_VERSION}\x00{content}".encode('utf-8')).hexdigest()
+
+
+def _new_markdown():
+    return markdown.Markdown(extensions=MARKDOWN_EXTENSIONS, extension_configs=MARKDOWN_EXTENSION_CONFIGS)
+
+
+def _flatten_toc(tokens):
+    flat = []
+    for token in tokens:
+        flat.append({k: v for k, v in token.items() if k != 'children'})
+        flat.extend(_flatten_toc(token['children']))
+    return flat
+
+
+def _fence_end(lines, i):
+    """lines[i] 是围栏代码块的开头，返回代码块结束后的下一行"""
+    mark, n = FENCE_RE.match(lines[i]).group(1), len(lines)
+    i += 1
+    while i < n and not (lines[i].strip().startswith(mark[0] * len(mark))
+                         and not lines[i].strip().strip(mark[0])):
+        i += 1
+    return min(i + 1, n)
+
+
+def _math_end(lines, i):
+    """lines[i] 以 $$ 开头，返回公式块结束后的下一行"""
+    stripped, n = lines[i].strip(), len(lines)
+    if not (len(stripped) > 2 and stripped.endswith('$$')):
+        i += 1
+        while i < n and '$$' not in lines[i]:
+            i += 1
+    return min(i + 1, n)
+
+
+def split_blocks(content):
+    """
+    把正文切成顶层块：围栏代码块、$$ 公式块、ATX 标题各自成块，其余按空行分成段落组
+    列表 / 引用 / 缩进的续行 / HTML 块跨空行时仍归入同一组，保证逐块渲染与整篇渲染结果一致
+    """
+    lines = content.replace('\r\n', '\n').split('\n')
+    blocks, i, n = [], 0, len(lines)
+
+    while i < n:
+        line = lines[i]
+        if not line.strip():
+            i += 1
+            continue
+
+        if FENCE_RE.match(line):
+            start, i = i, _fence_end(lines, i)
+            blocks.append('\n'.join(lines[start:i]))
+            continue
+
+        stripped = line.strip()
+        if stripped.startswith('$$'):
+            start, i = i, _math_end(lines, i)
+            blocks.append('\n'.join(lines[start:i]))
+            continue
+
+        if HEADING_RE.match(line):
+            blocks.append(line)
+            i += 1
+            continue
+
+        start = i
+        is_list = bool(LIST_ITEM_RE.match(line))
+        is_quote = stripped.startswith('>')
+        html_block = HTML_BLOCK_RE.match(line)
+        html_close = f'</{html_block.group(1)}>' if html_block else None
+        html_open = html_close is not None and html_close not in line
+        i += 1
+        while i < n:
+            current = lines[i]
+            if html_open:
+                if html_close in current:
+                    html_open = False
+                i += 1
+                continue
+            if not current.strip():
+                j = i
+                while j < n and not lines[j].strip():
+                    j += 1
+                if j >= n:
+                    break
+                nxt = lines[j]
+                if (nxt[:1] in (' ', '\t')
+                        or (is_list and LIST_ITEM_RE.match(nxt))
+                        or (is_quote and nxt.lstrip().startswith('>'))):
+                    i = j
+                    continue
+                break
+            if HEADING_RE.match(current):
+                break
+            # 紧跟在段落 / 列表后面 (中间没有空行) 的代码块和公式块，整篇渲染时仍留在这一段里，
+            # 所以整块并入当前组；不能逐行往下扫，否则块内的空行会把它从中间切开
+            if FENCE_RE.match(current):
+                i = _fence_end(lines, i)
+                continue
+            if current.strip().startswith('$$'):
+                i = _math_end(lines, i)
+                continue
+            i += 1
+        blocks.append('\n'.join(lines[start:i]))
+
+    return blocks
+
+
+def _render_block(block):
+    md = _new_markdown()
+    return {"html": md.convert(block), "headings": _flatten_toc(md.toc_tokens)}
+
+
+def _render_blocks(blocks, timeout_key="POST_RENDER_BLOCK"):
+    """逐块取缓存，只渲染缺失的块；timeout_key 为新渲染的块在 CACHE_TIMEOUTS 中的过期时间"""
+    keys = [
+        settings.CACHE_KEYS["POST_RENDER_BLOCK"].format(digest=content_digest(block))
+        for block in blocks
+    ]
+    cached = cache.get_many(keys)
+    missing = {}
+    results = []
+    for key, block in zip(keys, blocks):
+        rendered = cached.get(key) or missing.get(key)
+        if rendered is None:
+            rendered = missing[key] = _render_block(block)
+        results.append(rendered)
+    if missing:
+        cache.set_many(missing, timeout=settings.CACHE_TIMEOUTS[timeout_key])
+    return results
+
+
+def _rename_ids(html, renames):
+    """按出现顺序替换标题 id (同一块内可能有重名标题，不能简单全局 replace)"""
+    parts, pos = [], 0
+    for old, new in renames:
+        needle = f'id="{old}"'
+        index = html.find(needle, pos)
+        if index < 0:
+            continue
+        parts.append(html[pos:index])
+        parts.append(f'id="{new}"')
+        pos = index + len(needle)
+    parts.append(html[pos:])
+    return ''.join(parts)
+
+
+def _assemble(rendered_blocks):
+    """
+    拼接各块的 HTML，并用缓存里的标题信息重新生成 TOC
+    每块单独渲染时标题 id 只在块内去重，这里按整篇重新去重 (与 toc 扩展的规则一致)
+    """
+    used_ids, html_parts, headings = set(), [], []
+    for rendered in rendered_blocks:
+        renames = []
+        for heading in rendered["headings"]:
+            new_id = unique(heading["id"], used_ids)
+            renames.append((heading["id"], new_id))
+            headings.append({**heading, "id": new_id})
+        html = rendered["html"]
+        if any(old != new for old, new in renames):
+            html = _rename_ids(html, renames)
+        html_parts.append(html)
+
+    md = _new_markdown()
+    div = md.treeprocessors['toc'].build_toc_div(nest_toc_tokens(headings))
+    toc = md.serializer(div)
+    for processor in md.postprocessors:
+        toc = processor.run(toc)
+    return {"html": '\n'.join(html_parts), "toc": toc}
+
+
+def detect_assets(html):
+    """页面需要的静态资源：{"math": 是否有公式 (KaTeX)}"""
+    return {"math": bool(ARITHMATEX_RE.search(html))}
+
+
+def render_markdown(content, timeout_key="POST_RENDER_BLOCK"):
+    """
+    执行 Markdown 渲染 (逐块复用缓存)，返回 {"html": ..., "toc": ..., "assets": ...}
+    timeout_key: 新渲染的块的缓存时间，编辑器预览传 POST_PREVIEW_BLOCK，不让中间稿长期占用 Redis
+    """
+    if WHOLE_DOCUMENT_RE.search(content):
+        md = _new_markdown()
+        rendered = {"html": md.convert(content), "toc": md.toc}
+    else:
+        rendered = _assemble(_render_blocks(split_blocks(content), timeout_key))
+    rendered["assets"] = detect_assets(rendered["html"])
+    return rendered
+
+
+def get_rendered_post(post):
+    """
+    取文章的渲染结果，缓存未命中时才渲染 (懒计算)
+    """
+    digest = content_digest(post.content)
+    key = settings.CACHE_KEYS["POST_RENDER"].format(digest=digest)
+    rendered = cache.get(key)
+    if rendered is None:
+        rendered = _render_and_store(post, digest)
+    return rendered
+
+
+def warm_post(post):
+    """保存文章时预先渲染，读者第一次访问也能直接命中"""
+    digest = content_digest(post.content)
+    if cache.get(settings.CACHE_KEYS["POST_RENDER"].format(digest=digest)) is None:
+        _render_and_store(post, digest)
+
+
+def _render_and_store(post, digest):
+    rendered = render_markdown(post.content)
+    cache.set(settings.CACHE_KEYS["POST_RENDER"].format(digest=digest), rendered,
+              timeout=settings.CACHE_TIMEOUTS["POST_RENDER"])
+
+    # 记录文章当前对应的哈希；正文改动后顺手删掉旧版本，不必等它过期
+    if post.pk:
+        pointer_key = settings.CACHE_KEYS["POST_RENDER_POINTER"].format(post_id=post.pk)
+        old_digest = cache.get(pointer_key)
+        if old_digest and old_digest != digest:
+            cache.delete(settings.CACHE_KEYS["POST_RENDER"].format(digest=old_digest))
+        cache.set(pointer_key, digest, timeout=settings.CACHE_TIMEOUTS["POST_RENDER"])
+    return rendered
+
+
+def split_sections(html):
+    """
+    按顶层 h2 切分渲染结果，第一个 h2 之前的引言单独作为第 0 节
+    引用、列表、原始 HTML 块里的 h2 不是切分点，否则会把外层标签从中间切断
+    """
+    cuts, depth = [], 0
+    for match in SECTION_TAG_RE.finditer(html):
+        closing, tag, self_closing = match.groups()
+        if tag is None:
+            continue
+        tag = tag.lower()
+        if closing:
+            depth = max(depth - 1, 0)
+        elif tag not in VOID_ELEMENTS and not self_closing:
+            if tag == 'h2' and depth == 0:
+                cuts.append(match.start())
+            depth += 1
+    bounds = [0, *cuts, len(html)]
+    sections = (html[start:end] for start, end in zip(bounds, bounds[1:]))
+    return [section for section in sections if section.strip()]
+
+
+def get_lazy_sections(rendered):
+    """
+    长文返回章节列表 [{"index", "html", "anchors"}]，前 LAZY_SECTIONS_INLINE 节带 html，其余为 None；
+    文章不够长 (或切不出多节) 时返回 None，整篇直出
+    anchors 是该节内所有标题 id，目录跳转到未加载的章节时据此找到要加载的占位块
+    """
+    if len(rendered["html"]) < LAZY_SECTIONS_MIN_LENGTH:
+        return None
+    sections = split_sections(rendered["html"])
+    if len(sections) <= LAZY_SECTIONS_INLINE:
+        return None
+    return [
+        {
+            "index": index,
+            "html": html if index < LAZY_SECTIONS_INLINE else None,
+            "anchors": " ".join(HEADING_ID_RE.findall(html)),
+            "length": len(html),
+        }
+        for index, html in enumerate(sections)
+    ]
+
+
+def get_post_section(post, index):
+    """
+    取单个章节的 HTML (HTMX 片段)，每节单独缓存；未命中时从整篇渲染结果切分并一次性写入所有章节
+    index 越界返回 None
+    """
+    digest = content_digest(post.content)
+    key_template = settings.CACHE_KEYS["POST_SECTION"]
+    html = cache.get(key_template.format(digest=digest, index=index))
+    if html is not None:
+        return html
+
+    sections = split_sections(get_rendered_post(post)["html"])
+    cache.set_many(
+        {key_template.format(digest=digest, index=i): section for i, section in enumerate(sections)},
+        timeout=settings.CACHE_TIMEOUTS["POST_SECTION"],
+    )
+    return sections[index] if 0 <= index < len(sections) else None
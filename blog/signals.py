@@ -0,0 +1,55 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.page_cache import bump_generation
+
+from . import navigation
+from .models import Category, Post, Tag
+from .rendering import warm_post
+
+
+@receiver(post_save, sender=Post)
+def warm_post_render_cache(sender, instance, **kwargs):
+    """
+    文章保存后预渲染 Markdown (仅已发布文章)
+    放在事务提交之后执行，渲染失败也不影响保存
+    """
+    if instance.status != 'published':
+        return
+    transaction.on_commit(lambda: warm_post(instance), robust=True)
+
+
+def _after_navigation_change(update=None):
+    """
+    事务提交后先更新导航索引 / 侧边栏，最后再让整页缓存失效
+    顺序不能反：代数先 +1 的话，期间的请求会把旧的上下篇 / 计数按新代数缓存下来
+    """
+    def callback():
+        try:
+            if update:
+                update()
+            navigation.refresh_sidebar()
+        finally:
+            bump_generation()  # 索引更新失败也要让页面缓存失效
+    transaction.on_commit(callback, robust=True)
+
+
+@receiver(post_save, sender=Post)
+def update_post_navigation(sender, instance, **kwargs):
+    """上一篇 / 下一篇索引只增删这一篇；发布状态或分类可能变了，侧边栏计数重新统计"""
+    _after_navigation_change(lambda: navigation.sync_post(instance))
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_navigation(sender, instance, **kwargs):
+    post_id = instance.pk
+    _after_navigation_change(lambda: navigation.remove_post(post_id))
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Tag)
+@receiver(m2m_changed, sender=Post.tags.through)
+def refresh_sidebar(sender, **kwargs):
+    if kwargs.get("action", "post_").startswith("post_"):
+        _after_navigation_change()
@@ -0,0 +1,10 @@
+# blog/tasks.py
+from celery import shared_task
+
+from .counters import flush_views
+
+
+@shared_task
+def flush_post_views():
+    """由 Celery beat 定时调度 (CELERY_BEAT_SCHEDULE)，把 Redis 中累计的阅读量写回数据库"""
+    return flush_views()
@@ -1,3 +1,279 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from core.page_cache import bump_generation
+
+from . import counters, navigation
+from .models import Category, Post, Tag
+from .rendering import _assemble, _new_markdown, _render_blocks, split_blocks, split_sections
+
+# 测试用独立的 Redis key，避免和开发环境的数据互相影响
+TEST_CACHE_KEYS = {
+    **settings.CACHE_KEYS,
+    "POST_VIEWS_PENDING": "test:blog:views:pending",
+    "POST_VIEWS_FLUSHING": "test:blog:views:flushing",
+    "POST_VIEWS_FLUSH_LOCK": "test:blog:views:flush_lock",
+    "BLOG_SIDEBAR": "test:blog:nav:sidebar",
+    "BLOG_NAV_ORDER": "test:blog:nav:order",
+    "BLOG_NAV_META": "test:blog:nav:meta",
+    "BLOG_NAV_BUILT": "test:blog:nav:built",
+}
+NAV_KEYS = ("BLOG_NAV_ORDER", "BLOG_NAV_META", "BLOG_NAV_BUILT")
+
+
+@override_settings(CACHE_KEYS=TEST_CACHE_KEYS)
+class ViewCounterTestCase(TestCase):
+
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        self.redis.delete(*[TEST_CACHE_KEYS[k] for k in ("POST_VIEWS_PENDING", "POST_VIEWS_FLUSHING", "POST_VIEWS_FLUSH_LOCK")])
+        author = get_user_model().objects.create_user(username="author", password="x")
+        self.post = Post.objects.create(title="a", slug="a", content="a", author=author, status="published", views=10)
+        self.other = Post.objects.create(title="b", slug="b", content="b", author=author, status="published")
+
+    def tearDown(self):
+        self.redis.delete(*[TEST_CACHE_KEYS[k] for k in ("POST_VIEWS_PENDING", "POST_VIEWS_FLUSHING", "POST_VIEWS_FLUSH_LOCK")])
+
+    def views_in_db(self, post):
+        return Post.objects.values_list("views", flat=True).get(pk=post.pk)
+
+    def test_flush_writes_all_deltas_in_one_go(self):
+        for _ in range(3):
+            counters.record_view(self.post.id)
+        counters.record_view(self.other.id)
+
+        # 写回之前：数据库不变，展示值包含 Redis 中的增量
+        self.assertEqual(self.views_in_db(self.post), 10)
+        self.assertEqual(counters.with_buffered_views(Post.objects.get(pk=self.post.pk)).views, 13)
+
+        self.assertEqual(counters.flush_views(), 2)
+        self.assertEqual(self.views_in_db(self.post), 13)
+        self.assertEqual(self.views_in_db(self.other), 1)
+        self.assertEqual(counters.buffered_views([self.post.id]), {self.post.id: 0})
+
+        # 没有新访问时再次写回不产生任何修改
+        self.assertEqual(counters.flush_views(), 0)
+        self.assertEqual(self.views_in_db(self.post), 13)
+
+    def test_crash_during_db_write_keeps_deltas(self):
+        counters.record_view(self.post.id)
+        counters.record_view(self.post.id)
+
+        with patch.object(counters, "_apply_deltas", side_effect=RuntimeError("worker killed")):
+            with self.assertRaises(RuntimeError):
+                counters.flush_views()
+
+        # 增量仍保留在 flushing 批次中，展示值不受影响
+        self.assertEqual(self.views_in_db(self.post), 10)
+        self.assertEqual(counters.buffered_views([self.post.id]), {self.post.id: 2})
+
+        # 崩溃后新的访问进入新的 pending，下一次写回时两批都要计入且各计一次
+        counters.record_view(self.post.id)
+        counters.flush_views()
+        self.assertEqual(self.views_in_db(self.post), 13)
+        self.assertFalse(self.redis.exists(TEST_CACHE_KEYS["POST_VIEWS_FLUSHING"]))
+
+    def test_failed_batch_is_rolled_back(self):
+        """同一批次中后面的语句失败时，前面已执行的 UPDATE 也要回滚，否则重试时会重复计入"""
+        counters.record_view(self.post.id)
+        counters.record_view(self.other.id)
+
+        with patch.object(counters, "FLUSH_BATCH_SIZE", 1):
+            original_update = QuerySet.update
+            calls = []
+
+            def flaky_update(queryset, **kwargs):
+                calls.append(1)
+                if len(calls) == 2:
+                    raise RuntimeError("connection lost")
+                return original_update(queryset, **kwargs)
+
+            with patch.object(QuerySet, "update", flaky_update):
+                with self.assertRaises(RuntimeError):
+                    counters.flush_views()
+
+            self.assertEqual(self.views_in_db(self.post), 10)
+            self.assertEqual(self.views_in_db(self.other), 0)
+
+            counters.flush_views()
+        self.assertEqual(self.views_in_db(self.post), 11)
+        self.assertEqual(self.views_in_db(self.other), 1)
+
+    def test_concurrent_flush_is_skipped(self):
+        counters.record_view(self.post.id)
+        lock = self.redis.lock(TEST_CACHE_KEYS["POST_VIEWS_FLUSH_LOCK"], timeout=10)
+        lock.acquire()
+        try:
+            self.assertEqual(counters.flush_views(), 0)
+        finally:
+            lock.release()
+        self.assertEqual(self.views_in_db(self.post), 10)
+        self.assertEqual(counters.flush_views(), 1)
+
+
+class DerivedFieldsTestCase(TestCase):
+
+    def setUp(self):
+        self.author = get_user_model().objects.create_user(username="author", password="x")
+
+    def test_fields_are_computed_on_save(self):
+        content = "# 标题\n\n这是**第一段**，含 $a+b$ 公式。Hello world\n\n```python\nprint(1)\n```\n"
+        post = Post.objects.create(title="a", slug="a", content=content, author=self.author)
+        post.refresh_from_db()
+
+        self.assertEqual(post.excerpt, "标题 这是第一段，含 公式。Hello world")
+        # 中日韩字符每字计 1：标题这是第一段含公式 (10) + Hello / world / a / b / python / print / 1 (7)
+        self.assertEqual(post.word_count, 17)
+        self.assertEqual(post.reading_time, 1)
+        self.assertTrue(post.has_math)
+        self.assertTrue(post.has_code)
+
+    def test_manual_excerpt_is_kept(self):
+        post = Post.objects.create(title="a", slug="a", content="正文 $5 和 $10", excerpt="手写摘要", author=self.author)
+        post.content = "`$x$` 不是公式"
+        post.save(update_fields=["content"])
+        post.refresh_from_db()
+
+        self.assertEqual(post.excerpt, "手写摘要")
+        self.assertFalse(post.has_math)
+        self.assertFalse(post.has_code)
+
+    def test_auto_excerpt_follows_content(self):
+        post = Post.objects.create(title="a", slug="a", content="第一版正文", author=self.author)
+        for content in ("第二版正文", "第三版正文"):
+            post = Post.objects.get(pk=post.pk)
+            post.content = content
+            post.save()
+            post.refresh_from_db()
+            self.assertEqual(post.excerpt, content)
+            self.assertTrue(post.excerpt_auto)
+
+        # 手动改过摘要之后不再覆盖；清空后恢复自动生成
+        post = Post.objects.get(pk=post.pk)
+        post.excerpt = "手写摘要"
+        post.save()
+        post.content = "第四版正文"
+        post.save()
+        self.assertEqual(Post.objects.get(pk=post.pk).excerpt, "手写摘要")
+
+        post.excerpt = ""
+        post.save()
+        self.assertEqual(Post.objects.get(pk=post.pk).excerpt, "第四版正文")
+
+
+@override_settings(CACHE_KEYS=TEST_CACHE_KEYS)
+class NavigationIndexTestCase(TestCase):
+
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        self.redis.delete(*[TEST_CACHE_KEYS[k] for k in NAV_KEYS])
+        self.author = get_user_model().objects.create_user(username="author", password="x")
+        self.category = Category.objects.create(name="c", slug="c")
+        self.tag = Tag.objects.create(name="t", slug="t")
+        now = timezone.now()
+        # 前两篇发布时间相同，按 id 排序
+        self.posts = [
+            self.create_post(str(i), published_at=now + timedelta(minutes=max(i, 1)))
+            for i in range(4)
+        ]
+
+    def tearDown(self):
+        self.redis.delete(*[TEST_CACHE_KEYS[k] for k in NAV_KEYS])
+
+    def create_post(self, slug, status="published", **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(title=slug, slug=slug, content="x", author=self.author, status=status,
+                                       category=self.category, **kwargs)
+            post.tags.add(self.tag)
+        return post
+
+    def neighbor_slugs(self, post):
+        return tuple(p and p["slug"] for p in navigation.get_neighbors(post))
+
+    def test_neighbors_follow_publish_order(self):
+        a, b, c, d = self.posts
+        self.assertEqual(self.neighbor_slugs(a), (None, b.slug))
+        self.assertEqual(self.neighbor_slugs(b), (a.slug, c.slug))
+        self.assertEqual(self.neighbor_slugs(d), (c.slug, None))
+
+    def test_index_is_updated_incrementally(self):
+        a, b, c, d = self.posts
+        with self.captureOnCommitCallbacks(execute=True):
+            c.status = "draft"
+            c.save()
+        self.assertEqual(self.neighbor_slugs(b), (a.slug, d.slug))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            b.delete()
+        self.assertEqual(self.neighbor_slugs(a), (None, d.slug))
+
+        # 索引丢失时从数据库重建
+        self.redis.delete(*[TEST_CACHE_KEYS[k] for k in NAV_KEYS])
+        self.assertEqual(self.neighbor_slugs(d), (a.slug, None))
+
+    def test_sidebar_counts_published_posts_only(self):
+        self.create_post("draft", status="draft")
+        with self.assertNumQueries(0):
+            sidebar = navigation.get_sidebar()
+        self.assertEqual(sidebar["categories"], [{"name": "c", "slug": "c", "post_count": 4}])
+        self.assertEqual(sidebar["tags"], [{"name": "t", "slug": "t", "post_count": 4}])
+
+    def test_neighbor_page_shows_newly_published_post(self):
+        latest = self.posts[-1]
+        url = f"/blog/{latest.slug}/"
+        self.assertNotIn("/blog/new/", self.client.get(url).content.decode())
+        self.assertEqual(self.client.get(url)["X-Page-Cache"], "HIT")
+
+        # 代数 +1 时导航索引必须已经包含新文章，否则期间的请求会把旧页面按新代数缓存
+        # (on_commit 回调中的异常会被吞掉，只记录下来，最后再断言)
+        seen_at_bump = []
+
+        def record_index_then_bump():
+            seen_at_bump.append(self.neighbor_slugs(latest))
+            bump_generation()
+
+        with patch("blog.signals.bump_generation", side_effect=record_index_then_bump):
+            self.create_post("new", published_at=latest.published_at + timedelta(minutes=1))
+        self.assertTrue(seen_at_bump)
+        self.assertTrue(all(seen == (self.posts[-2].slug, "new") for seen in seen_at_bump))
+
+        response = self.client.get(url)
+        self.assertEqual(response["X-Page-Cache"], "MISS")
+        self.assertIn("/blog/new/", response.content.decode())
+
+
+class BlockRenderingTestCase(TestCase):
+    """逐块渲染后拼接的 HTML 必须与整篇一次渲染完全一致"""
+
+    CORPUS = {
+        "段落后紧跟代码块": "第一段\n```python\nx = 1\n\ny = 2\n```\n代码块后的文字\n\n第二段",
+        "列表后紧跟代码块": "- a\n- b\n```\ncode\n\n  indented\n```\n\n- c\n\n# 标题",
+        "段落后紧跟公式块": "第一段\n$$\na^2\n\n+ b^2\n$$\n公式后的文字\n\n第二段",
+        "段落内的单行公式块": "第一段\n$$x$$\n结尾",
+        "顶层块": "# 标题\n\n```\na\n\nb\n```\n\n$$\nx\n$$\n\n## 小节\n\n段落\n\n- 列表\n\n  续行\n\n> 引用\n>\n> 第二行",
+    }
+
+    def test_blocks_render_like_whole_document(self):
+        for name, content in self.CORPUS.items():
+            with self.subTest(name):
+                self.assertEqual(_assemble(_render_blocks(split_blocks(content)))["html"],
+                                 _new_markdown().convert(content))
+
+    def test_sections_split_on_top_level_h2_only(self):
+        content = "引言\n\n## 第一节\n\n正文\n\n> ## quoted\n>\n> 引用\n\n<div>\n<h2>原始 HTML</h2>\n</div>\n\n## 第二节\n\n结尾"
+        html = _new_markdown().convert(content)
+        sections = split_sections(html)
+
+        self.assertEqual(''.join(sections), html)
+        self.assertEqual(len(sections), 3)
+        self.assertIn("quoted", sections[1])
+        self.assertIn("原始 HTML", sections[1])
+        for section in sections:
+            self.assertEqual(section.count("<blockquote>"), section.count("</blockquote>"))
@@ -10,4 +10,7 @@ urlpatterns = [
 
     # (预留) 博客详情页 - 我们下一步会写这个
     path("<str:slug>/", views.post_detail, name="post_detail"),
+
+    # 长文章节片段 (HTMX 懒加载)
+    path("<str:slug>/sections/<int:index>/", views.post_section, name="post_section"),
 ]
\ No newline at end of file
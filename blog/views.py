@@ -1,14 +1,21 @@
 from django.shortcuts import render,get_object_or_404,redirect
-from django.core.paginator import Paginator
-from .models import Post, Category, Tag
-from django.db.models import Count,F
-import markdown
-
-
+from django.http import Http404, HttpResponseForbidden
+from .models import Post
+from core.pagination import keyset_page
+from core.page_cache import (anonymous_page_cache, conditional_page, latest_updated_at, respond_conditionally,
+                             serve_cached_page)
+from core.visitors import POST_UNLOCKS, POST_VIEWS
+from .counters import record_view, with_buffered_views
+from .navigation import get_neighbors, get_sidebar
+from .rendering import get_rendered_post, get_lazy_sections, get_post_section
+
+
+@conditional_page(lambda request: [latest_updated_at("post", Post.objects.filter(status='published'))])
+@anonymous_page_cache
 def post_list(request):
 
-    # 一次性查出分类和标签 避免N+1
-    posts = Post.objects.filter(status='published').select_related('category').prefetch_related('tags').order_by('-published_at')
+    # 一次性查出分类和标签 避免N+1；列表只用摘要等派生字段，不读取正文
+    posts = Post.objects.filter(status='published').select_related('category').prefetch_related('tags').defer('content')
 
     # 筛选通过URL参数筛选分类和标签
     category_slug = request.GET.get('category')
@@ -19,100 +26,109 @@ def post_list(request):
     if tag_slug:
         posts = posts.filter(tags__slug=tag_slug)
 
-    # 分页逻辑
-    paginator = Paginator(posts, 9)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    # 游标分页 (无限滚动)：按 (published_at, id) 倒序，不用 OFFSET
+    page = keyset_page(posts, 'published_at', request.GET.get('cursor'), per_page=9)
     query_params = request.GET.copy()
-    if 'page' in query_params:
-        del query_params['page']
+    for key in ('cursor', 'page'):
+        query_params.pop(key, None)
     encoded_params = query_params.urlencode()
 
     context = {
-        'posts': page_obj,
-        'categories': Category.objects.annotate(post_count=Count('post')),  #  侧边栏分类列表
-        'tags': Tag.objects.all(),             #  侧边栏标签列表
+        'posts': page,
         'base_query_params': encoded_params,
     }
 
     if request.htmx:
         return render(request, 'blog/partials/post_rows.html', context)
 
+    # 以下只有整页请求需要，无限滚动的 HTMX 请求不再执行 COUNT(*)
+    # 侧边栏的分类 / 标签计数只在文章变更时重新统计 (见 blog/navigation.py)
+    sidebar = get_sidebar()
+    context.update({
+        'total': posts.count(),
+        'categories': sidebar['categories'],  #  侧边栏分类列表
+        'tags': sidebar['tags'],             #  侧边栏标签列表
+    })
+
     return render(request, 'blog/list.html', context)
 
 def post_detail(request, slug):
     # 获取公开的文章
     post = get_object_or_404(Post, slug=slug, status='published')
 
-    view_session_key = f'has_viewed_post_{post.id}' # 阅读量key
-    if not request.session.get(view_session_key, False):
-        Post.objects.filter(pk=post.pk).update(views=F('views') + 1)
-        # 必须刷新！否则 post.views 在内存中还是个 F() 表达式，传给模板会显示不正常
-        post.refresh_from_db()
-        # 在 Session 中标记已读，防止刷新页面重复计数
-        request.session[view_session_key] = True
-
-    unlock_session_key = f'post_unlocked_{post.id}'
-    # 如果文章有密码(is_encrypted) 且 Session里没有记录True，则视为锁定
-    is_locked = post.is_encrypted and not request.session.get(unlock_session_key, False)
+    # 访客 24 小时内第一次访问才计数 (标记存在 Redis bitmap 中，不再写 Session)
+    # 计数放在整页缓存之外，命中缓存时也照常计数
+    if not POST_VIEWS.add(request, post.id):
+        # 只在 Redis 中累加，由 Celery beat 定时批量写回数据库
+        record_view(post.id)
+
+    if not post.is_encrypted:
+        # 公开文章对所有匿名访客都一样：先做条件请求 (304)，再走整页缓存
+        return respond_conditionally(
+            request, [post.updated_at],
+            lambda: serve_cached_page(request, lambda: _render_post_detail(request, post, is_locked=False)))
+
+    # 如果文章有密码(is_encrypted) 且该访客没有解锁记录，则视为锁定
+    is_locked = not POST_UNLOCKS.contains(request, post.id)
     error_message = None
     if request.method == 'POST':
         input_password = request.POST.get('password')
         if input_password == post.password:
-            request.session[unlock_session_key] = True
-            request.session.set_expiry(3600)
+            POST_UNLOCKS.add(request, post.id)  # 解锁 1 小时
             return redirect('blog:post_detail', slug=slug)
         else:
             error_message = "访问密码错误，请重新输入"
             is_locked = True  # 保持锁定状态
 
+    return _render_post_detail(request, post, is_locked, error_message)
+
+
+def _render_post_detail(request, post, is_locked, error_message=None):
+    # 展示的阅读量 = 数据库中的值 + Redis 中尚未写回的增量
+    with_buffered_views(post)
+
     post_content = ""
     post_toc = ""
+    sections = None
+    page_assets = {}
     if not is_locked:  # 解锁才渲染markdown
-        # markdown渲染配置
-        md = markdown.Markdown(
-            extensions=[
-                'toc',
-                'tables',
-                'pymdownx.highlight',  # 替代 codehilite，代码高亮
-                'pymdownx.superfences',  # 替代 fenced_code，支持更好看的代码块
-                'pymdownx.arithmatex',  # 替代 mdx_math，修复数学公式渲染问题!!!
-            ],
-            extension_configs={
-                # 1. 修复数学公式的关键配置
-                'pymdownx.arithmatex': {
-                    'generic': True,  # 开启通用模式，它会输出 \( ... \) 而不是 script 标签
-                },
-                # 2. 代码高亮配置
-                'pymdownx.highlight': {
-                    'css_class': 'mockup-code w-full highlight',
-                    'linenums': False,
-                    'use_pygments': True,
-                },
-                # 3. 允许代码块嵌套
-                'pymdownx.superfences': {
-                    "disable_indented_code_blocks": True
-                }
-            }
-        )
-        # 转换内容
-        post_content = md.convert(post.content)
-
-        # 获取目录 (TOC) - 稍后在模板里用
-        post_toc = md.toc
-
-    prev_post = Post.objects.filter(status='published', published_at__lt=post.published_at).order_by(
-        '-published_at').first()
-    next_post = Post.objects.filter(status='published', published_at__gt=post.published_at).order_by(
-        'published_at').first()
+        # 渲染结果按正文哈希缓存，命中时不会执行 Markdown 渲染
+        rendered = get_rendered_post(post)
+        post_content = rendered["html"]
+
+        # 获取目录 (TOC) - 稍后在模板里用，长文分章节加载时目录仍然一次给全
+        post_toc = rendered["toc"]
+
+        # 超长文章只直出前几节，其余章节由 HTMX 懒加载
+        sections = get_lazy_sections(rendered)
+
+        # 有公式才加载 KaTeX，有代码块才加载高亮样式 (base.html 据此输出样式和 preload)
+        page_assets = rendered["assets"]
+
+    # 上一篇 / 下一篇从 Redis 中的排序索引读取，不再执行两条排序查询
+    prev_post, next_post = get_neighbors(post)
 
     context = {
         'post': post,
         'content': post_content,
         'toc': post_toc,
+        'sections': sections,
+        'page_assets': page_assets,
         'prev_post': prev_post,
         'next_post': next_post,
         'is_locked': is_locked,  # 传给模板：是否锁定
         'error_message': error_message,  # 传给模板：错误提示
     }
-    return render(request, 'blog/detail.html', context)
\ No newline at end of file
+    return render(request, 'blog/detail.html', context)
+
+
+def post_section(request, slug, index):
+    """长文的单个章节 (HTMX 片段)，不计阅读量"""
+    post = get_object_or_404(Post, slug=slug, status='published')
+    if post.is_encrypted and not POST_UNLOCKS.contains(request, post.id):
+        return HttpResponseForbidden()
+
+    html = get_post_section(post, index)
+    if html is None:
+        raise Http404
+    return render(request, 'blog/partials/post_section.html', {'index': index, 'html': html})
@@ -5,12 +5,51 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+部署 (uvicorn worker，由 Gunicorn 管理进程)：
+    gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker -w 2 \
+        --max-requests 1000 --max-requests-jitter 100 -b 127.0.0.1:8000
+
+Django 自带的 ASGIHandler 不处理 lifespan 协议，这里包一层：
+服务启动时创建共享的 Go-Judge / Redis 连接池，关闭时释放 Go-Judge、Redis 与 LLM 客户端
 """
 
+import logging
 import os
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# 必须在 Django 初始化之后导入
+from tools.clients import open_shared_clients, close_shared_clients  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                await open_shared_clients()
+            except Exception as e:
+                logger.exception(f"ASGI startup failed: {e}")
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            try:
+                await close_shared_clients()
+            finally:
+                await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    else:
+        await django_application(scope, receive, send)
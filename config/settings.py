@@ -80,7 +80,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "debug_toolbar.middleware.DebugToolbarMiddleware", # debug中间件
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.LazySessionMiddleware',  # 只在修改时写 Session，未修改时定期 EXPIRE 续期
+    'core.middleware.VisitorIdMiddleware',  # 访客 id Cookie (阅读 / 点赞 / 解锁去重)
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     "django_htmx.middleware.HtmxMiddleware",
@@ -204,16 +205,50 @@ CACHES = {
         }
     }
 }
-SESSION_ENGINE = "django.contrib.sessions.backends.cache"
+SESSION_ENGINE = "core.sessions"  # Django cache 后端 + 只刷新过期时间的 touch()
 SESSION_CACHE_ALIAS = "default"
 
 # 缓存常量
 CACHE_KEYS = {
     "DASHBOARD_COUNTS": "dashboard:counts:v1",
+    "JUDGE_SPEED_BASELINE": "judge:speed_baseline:v1:{host}",
+    "AI_GEN_RESULT": "ai_gen:result:{digest}",
+    "AI_GEN_INFLIGHT": "ai_gen:inflight:{digest}",
+    "AI_GEN_STREAM": "ai_gen:stream:{task_id}",
+    "TASK_EVENTS": "task_events:{task_id}",  # Redis pub/sub 频道
+    "POST_RENDER": "blog:render:{digest}",  # 文章渲染结果，digest 已包含渲染配置版本
+    "POST_RENDER_POINTER": "blog:render_pointer:{post_id}",
+    "POST_RENDER_BLOCK": "blog:render_block:{digest}",  # 单个顶层块的渲染结果，正文局部修改时复用
+    "POST_SECTION": "blog:section:{digest}:{index}",  # 长文按 h2 切分后的单个章节，供 HTMX 懒加载
+    "POST_VIEWS_PENDING": "blog:views:pending",  # Redis Hash，post_id -> 尚未写回数据库的阅读量
+    "POST_VIEWS_FLUSHING": "blog:views:flushing",  # 正在写回的批次
+    "POST_VIEWS_FLUSH_LOCK": "blog:views:flush_lock",
+    "BLOG_SIDEBAR": "blog:nav:sidebar",  # 列表页侧边栏：分类 / 标签及已发布文章数
+    "BLOG_NAV_ORDER": "blog:nav:order",  # Redis ZSET，已发布文章按发布时间排序，用于上一篇 / 下一篇
+    "BLOG_NAV_META": "blog:nav:meta",  # Redis Hash，文章 -> slug / 标题
+    "BLOG_NAV_BUILT": "blog:nav:built",  # 索引已从数据库整体构建过的标记
+    "VISITOR_BITMAP": "visitor:{name}:{visitor_id}",  # 访客的看过 / 点赞 / 解锁标记，偏移量为对象主键
+    "PAGE_CACHE": "page_cache:{generation}:{digest}",  # 匿名访客整页缓存
+    "PAGE_CACHE_GENERATION": "page_cache:generation",  # 内容变更时 +1，整体失效
+    "PAGE_CACHE_CHANGED_AT": "page_cache:changed_at",  # 最近一次代数 +1 的时间戳，参与 Last-Modified
+    "PAGE_LATEST_UPDATED": "page_cache:latest:{generation}:{name}",  # 某类对象最新的 updated_at (条件请求用)
+    "PAGE_CACHE_STATS": "page_cache:stats:{day}",  # Redis Hash，当天的 hit / miss 次数
 }
 
 CACHE_TIMEOUTS = {
     "DASHBOARD_COUNTS": 300,
+    "JUDGE_SPEED_BASELINE": 60 * 60 * 24,
+    "AI_GEN_RESULT": 60 * 60 * 24 * 7,
+    "AI_GEN_INFLIGHT": 60 * 5,  # 兜底过期时间，防止 worker 异常退出后一直占位
+    "AI_GEN_STREAM": 60 * 10,
+    "POST_RENDER": 60 * 60 * 24 * 30,
+    "POST_RENDER_BLOCK": 60 * 60 * 24 * 7,
+    "POST_PREVIEW_BLOCK": 60 * 10,  # 编辑器预览的中间稿，多数不会发布，只需覆盖一次编辑过程
+    "POST_SECTION": 60 * 60 * 24,  # 可随时从整篇渲染结果重新切出，不必久存
+    "VISITOR_POST_VIEW": 60 * 60 * 24,  # 24 小时内重复访问不重复计阅读量
+    "VISITOR_POST_UNLOCK": 60 * 60,  # 输入一次密码保持解锁 1 小时
+    "VISITOR_GAME_LIKE": 60 * 60 * 24 * 365,
+    "PAGE_CACHE": 60 * 10,  # 阅读量、点赞数等计数最多滞后 10 分钟
 }
 
 # ==============================================================================
@@ -491,6 +526,9 @@ GO_JUDGE_BASE_URL = env('GO_JUDGE_BASE_URL', default="http://localhost:5050")
 MEMORY_LIMIT_MB = env.int('MEMORY_LIMIT_MB', default=256)
 MEMORY_LIMIT_BYTES = MEMORY_LIMIT_MB * 1024 * 1024
 CXX_COMPILER = "C++14"
+# 预编译头 (bits/stdc++.h)，由 `manage.py start_gojudge` 在沙箱内生成
+JUDGE_PCH_ENABLED = env.bool('JUDGE_PCH_ENABLED', default=True)
+JUDGE_PCH_ROOT = env('JUDGE_PCH_ROOT', default="/usr/local/share/pch")
 
 ######################################################################
 # 日志 设置
@@ -568,6 +606,8 @@ LOGGING = {
 ######################################################################
 LLM_API_KEY = env('LLM_API_KEY', default=None)
 LLM_API_URL = env('LLM_API_URL', default=None)
+LLM_REQUEST_TIMEOUT = 120  # 单次 LLM 请求超时 (秒)
+LLM_TASK_TIMEOUT = 180  # 整个 AI 生成任务的超时 (秒)，llm 队列使用 threads 池，Celery 的 time_limit 不生效
 
 ######################################################################
 # 安全设置
@@ -607,12 +647,36 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Shanghai'
 
+# 队列划分：
+#   llm     —— 等待 LLM 接口的 I/O 任务，threads 池高并发、几乎不占 CPU 和内存
+#   default —— 打包 / 评测等 CPU 密集任务，prefork 小池子
+# 启动方式见 README「Celery 队列」
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_ROUTES = {
+    'tools.tasks.task_ai_generate': {'queue': 'llm'},
+}
+# 以下限制只对 prefork 池生效 (llm 队列的超时由 LLM_TASK_TIMEOUT 控制)
+CELERY_TASK_SOFT_TIME_LIMIT = 240
+CELERY_TASK_TIME_LIMIT = 300
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # 长任务不预取，避免排在慢任务后面
+CELERY_WORKER_MAX_TASKS_PER_CHILD = 1000
+CELERY_WORKER_MAX_MEMORY_PER_CHILD = 200 * 1024  # KB，子进程常驻内存超过 200MB 后回收
+
+# 定时任务 (celery -A config beat)
+CELERY_BEAT_SCHEDULE = {
+    'flush-post-views': {
+        'task': 'blog.tasks.flush_post_views',
+        'schedule': 60.0,  # 阅读量在 Redis 中最多缓冲 1 分钟
+    },
+}
+
 
 ######################################################################
 # session
 ######################################################################
-# 每次请求都重新保存 Session
-SESSION_SAVE_EVERY_REQUEST = True
+# 只在 Session 被修改时保存；未修改的 Session 由 LazySessionMiddleware 定期续期
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_TOUCH_INTERVAL = 60 * 60 * 6  # 续期间隔上限，短 Session 按有效期的 1/4 续期
 
 
 # =================================================
@@ -1,3 +1,5 @@
+import logging
+
 import psutil
 from datetime import timedelta
 from django.utils import timezone
@@ -8,6 +10,11 @@ from django.db.models import Count
 from django.db.models.functions import TruncDay
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from redis.exceptions import RedisError
+
+from .page_cache import page_cache_stats
+
+logger = logging.getLogger(__name__)
 
 
 def dashboard_callback(request, context):
@@ -57,6 +64,13 @@ def dashboard_callback(request, context):
     counts = cache.get_or_set(settings.CACHE_KEYS["DASHBOARD_COUNTS"],
                               get_business_data, settings.CACHE_TIMEOUTS["DASHBOARD_COUNTS"])
 
+    # 匿名访客整页缓存的命中率 (当天)
+    try:
+        page_cache = page_cache_stats()
+    except RedisError as e:
+        logger.warning(f"page cache stats unavailable: {e}")
+        page_cache = {"hits": 0, "misses": 0, "rate": None}
+
     # =========================================================================
     # 3. 构造数据 (这里不含 HTML，只含数据)
     # =========================================================================
@@ -89,6 +103,11 @@ def dashboard_callback(request, context):
                 "metric": counts['user'],
                 "footer": f"累计上传 {counts['image']} 张图片",
             },
+            {
+                "title": _("页面缓存命中率"),
+                "metric": "-" if page_cache["rate"] is None else f"{page_cache['rate']}%",
+                "footer": f"今日命中 {page_cache['hits']} 次, 未命中 {page_cache['misses']} 次",
+            },
         ],
 
         # 进度条卡片数据
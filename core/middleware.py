@@ -0,0 +1,63 @@
+# core/middleware.py
+import time
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import http_date
+
+from .visitors import VISITOR_COOKIE_AGE, VISITOR_COOKIE_NAME
+
+
+class VisitorIdMiddleware(MiddlewareMixin):
+    """本次请求新生成了访客 id (见 core.visitors.get_visitor_id) 时写入 Cookie"""
+
+    def process_response(self, request, response):
+        if getattr(request, "_visitor_id_is_new", False):
+            response.set_cookie(
+                VISITOR_COOKIE_NAME,
+                request._visitor_id,
+                max_age=VISITOR_COOKIE_AGE,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+class LazySessionMiddleware(SessionMiddleware):
+    """
+    替代 SessionMiddleware，配合 SESSION_SAVE_EVERY_REQUEST = False 与 core.sessions 后端：
+    - 只有 Session 真正被修改时才整体写入 Redis (由父类处理)
+    - 读过但没改的 Session，每隔 SESSION_TOUCH_INTERVAL 执行一次 EXPIRE 并续期 Cookie，保持“无操作才过期”的语义
+    - 空 Session 从不写入，匿名访客 / 爬虫的 GET 请求不会产生 Session
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, "session", None)
+        if (session is not None and session.accessed and not session.modified
+                and response.status_code < 500 and session.session_key
+                and hasattr(session, "needs_touch") and not session.is_empty()
+                and session.needs_touch() and session.touch()):
+            self.set_session_cookie(session, response)
+        return super().process_response(request, response)
+
+    @staticmethod
+    def set_session_cookie(session, response):
+        if session.get_expire_at_browser_close():
+            max_age = None
+            expires = None
+        else:
+            max_age = session.get_expiry_age()
+            expires = http_date(time.time() + max_age)
+        response.set_cookie(
+            settings.SESSION_COOKIE_NAME,
+            session.session_key,
+            max_age=max_age,
+            expires=expires,
+            domain=settings.SESSION_COOKIE_DOMAIN,
+            path=settings.SESSION_COOKIE_PATH,
+            secure=settings.SESSION_COOKIE_SECURE or None,
+            httponly=settings.SESSION_COOKIE_HTTPONLY or None,
+            samesite=settings.SESSION_COOKIE_SAMESITE,
+        )
@@ -0,0 +1,181 @@
+# core/page_cache.py
+"""
+匿名访客整页缓存
+首页、文章列表、公开文章详情、游戏列表、路线图对所有匿名访客完全相同，命中缓存时不查库、不渲染模板
+
+- 缓存 key 由 完整 URL (含 query string) + HX-Request 头 决定，同一地址的整页和 HTMX 片段分开缓存
+- 登录用户、非 GET/HEAD 请求、带一次性消息 (messages Cookie) 的请求直接绕过
+- 失效靠 “代数”：key 中带全局代数，文章 / 分类 / 标签 / 游戏 / 站点配置变更时代数 +1 (见 core/signals.py)，
+  旧代数的页面不再被访问，等待自然过期
+- 命中 / 未命中次数按天记在 Redis Hash 中，后台仪表盘展示命中率
+
+条件请求 (ETag / Last-Modified)：见 respond_conditionally，浏览器和 nginx 复访时直接拿 304
+"""
+import hashlib
+import logging
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE_STATS_TTL = 60 * 60 * 24 * 8
+
+
+def _generation():
+    generation = cache.get(settings.CACHE_KEYS["PAGE_CACHE_GENERATION"])
+    if generation is None:
+        cache.add(settings.CACHE_KEYS["PAGE_CACHE_GENERATION"], 1, timeout=None)
+        generation = cache.get(settings.CACHE_KEYS["PAGE_CACHE_GENERATION"], 1)
+    return generation
+
+
+def bump_generation():
+    """让所有已缓存的页面失效"""
+    cache.add(settings.CACHE_KEYS["PAGE_CACHE_GENERATION"], 1, timeout=None)  # 首次或被清空后先初始化
+    cache.incr(settings.CACHE_KEYS["PAGE_CACHE_GENERATION"])
+    cache.set(settings.CACHE_KEYS["PAGE_CACHE_CHANGED_AT"], int(time.time()), timeout=None)
+
+
+def _page_key(request):
+    variant = f"{request.build_absolute_uri()}\x00{request.headers.get('HX-Request', '')}"
+    digest = hashlib.md5(variant.encode("utf-8")).hexdigest()
+    return settings.CACHE_KEYS["PAGE_CACHE"].format(generation=_generation(), digest=digest)
+
+
+def _bypass(request):
+    if request.method not in ("GET", "HEAD"):
+        return True
+    if CookieStorage.cookie_name in request.COOKIES:  # 有待显示的一次性消息
+        return True
+    return request.user.is_authenticated
+
+
+def _record(outcome):
+    """统计失败不能影响页面本身"""
+    try:
+        key = settings.CACHE_KEYS["PAGE_CACHE_STATS"].format(day=timezone.localdate().isoformat())
+        pipe = get_redis_connection("default").pipeline(transaction=False)
+        pipe.hincrby(key, outcome, 1)
+        pipe.expire(key, PAGE_CACHE_STATS_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"page cache stats failed: {e}")
+
+
+def serve_cached_page(request, render):
+    """
+    render: 无参函数，缓存未命中时生成响应
+    只缓存 200 响应，且只保存正文和 Content-Type，Set-Cookie 等响应头不进缓存
+    """
+    if _bypass(request):
+        return render()
+
+    key = _page_key(request)
+    cached = cache.get(key)
+    if cached is not None:
+        _record("hit")
+        response = HttpResponse(cached["content"], content_type=cached["content_type"])
+        response["X-Page-Cache"] = "HIT"
+        # 缓存的页面里没有 CSRF token，确保访客拿到 csrftoken Cookie，前端从 Cookie 读取
+        get_token(request)
+    else:
+        _record("miss")
+        response = render()
+        if response.status_code == 200 and not getattr(response, "streaming", False):
+            cache.set(key, {"content": response.content, "content_type": response["Content-Type"]},
+                      timeout=settings.CACHE_TIMEOUTS["PAGE_CACHE"])
+        response["X-Page-Cache"] = "MISS"
+    patch_vary_headers(response, ("HX-Request",))
+    return response
+
+
+def anonymous_page_cache(view):
+    """视图装饰器：整个视图的结果都可以按 URL 缓存时使用"""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        return serve_cached_page(request, lambda: view(request, *args, **kwargs))
+    return wrapped
+
+
+def page_cache_stats(day=None):
+    """某天 (默认今天) 的命中统计 {"hits", "misses", "rate"}，rate 为百分比，没有请求时为 None"""
+    day = day or timezone.localdate()
+    key = settings.CACHE_KEYS["PAGE_CACHE_STATS"].format(day=day.isoformat())
+    data = get_redis_connection("default").hgetall(key)
+    hits, misses = int(data.get(b"hit", 0)), int(data.get(b"miss", 0))
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "rate": round(hits * 100 / total, 1) if total else None}
+
+
+def latest_updated_at(name, queryset):
+    """
+    一类对象中最新的 updated_at，供列表页计算校验值
+    按站点代数缓存：内容变更时代数 +1 自然重新计算，平时不用每个请求都查一次库
+    """
+    key = settings.CACHE_KEYS["PAGE_LATEST_UPDATED"].format(generation=_generation(), name=name)
+    return cache.get_or_set(key, lambda: queryset.aggregate(latest=Max("updated_at"))["latest"],
+                            timeout=settings.CACHE_TIMEOUTS["PAGE_CACHE"])
+
+
+def respond_conditionally(request, timestamps, render, variant=""):
+    """
+    条件请求：校验值由 页面相关对象最新的 updated_at + 站点代数 (内容 / 配置变更时 +1) 得出
+    请求带的 If-None-Match / If-Modified-Since 仍然有效时直接返回 304，不调用 render
+    timestamps: 页面相关对象的 updated_at (可含 None)
+    variant: 同一 URL 因访客不同而不同的部分 (例如是否已点赞)
+    ETag 中还带有按 PAGE_CACHE 过期时间划分的时间段，让阅读量、点赞数这类不触发信号的计数也能定期刷新
+    """
+    if request.method not in ("GET", "HEAD"):
+        return render()
+
+    changed_at = cache.get(settings.CACHE_KEYS["PAGE_CACHE_CHANGED_AT"])
+    candidates = [int(ts.timestamp()) for ts in timestamps if ts] + ([changed_at] if changed_at else [])
+    last_modified = max(candidates) if candidates else None
+    period = int(time.time()) // settings.CACHE_TIMEOUTS["PAGE_CACHE"]
+    token = f"{_generation()}:{last_modified}:{period}:{request.headers.get('HX-Request', '')}:{variant}"
+    etag = quote_etag(hashlib.md5(token.encode("utf-8")).hexdigest())
+
+    headers = HttpResponse()
+    headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(headers, no_cache=True)  # 允许缓存，但每次使用前都要回源验证
+    patch_vary_headers(headers, ("HX-Request", "Cookie"))
+
+    # 条件不满足时 get_conditional_response 原样返回传入的 response，只有 304 / 412 才是新对象
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified, response=headers)
+    if conditional is not headers:
+        return conditional
+
+    response = render()
+    if response.status_code == 200:
+        for header in ("ETag", "Last-Modified", "Cache-Control"):
+            if header in headers:
+                response[header] = headers[header]
+        patch_vary_headers(response, ("HX-Request", "Cookie"))
+    return response
+
+
+def conditional_page(latest):
+    """
+    视图装饰器：latest(request, *args, **kwargs) 返回页面相关对象的 updated_at 列表
+    放在 anonymous_page_cache 外层，304 时连整页缓存都不用读
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            return respond_conditionally(
+                request, latest(request, *args, **kwargs), lambda: view(request, *args, **kwargs))
+        return wrapped
+    return decorator
@@ -0,0 +1,81 @@
+# core/pagination.py
+"""
+游标 (keyset) 分页
+WHERE (排序键, id) < (上一页最后一行) ORDER BY 排序键, id LIMIT n+1
+不用 OFFSET，也不用 COUNT(*)，翻到多深都只读一页数据；需要 (过滤条件, 排序键, id) 联合索引配合
+游标是上一页最后一行的 [排序键, id]，JSON 后做 urlsafe base64
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def keyset_ordering(field, descending=True):
+    """排序键 + id 兜底，保证顺序唯一，游标才不会跳过或重复同值的行"""
+    prefix = '-' if descending else ''
+    return [f'{prefix}{field}', f'{prefix}id']
+
+
+def encode_cursor(obj, field):
+    """排序键为空的行无法作为游标，返回 None"""
+    value = getattr(obj, field)
+    if value is None:
+        return None
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    payload = json.dumps([value, obj.pk]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(model, field, cursor):
+    """非法游标返回 None (当作第一页)；排序键为空的游标同样无效 (不能用 None 做范围查询)"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk = json.loads(payload)
+        value = model._meta.get_field(field).to_python(value)
+        if value is None:
+            return None
+        return value, int(pk)
+    except (ValueError, TypeError, ValidationError, binascii.Error):
+        return None
+
+
+def after_cursor(queryset, field, cursor, descending=True):
+    """只保留排在游标之后的行；多写一个 field <= value 让 MySQL 能直接在索引上做范围扫描"""
+    decoded = decode_cursor(queryset.model, field, cursor) if cursor else None
+    if decoded is None:
+        return queryset
+    value, pk = decoded
+    op = 'lt' if descending else 'gt'
+    return queryset.filter(
+        Q(**{f'{field}__{op}e': value}),
+        Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'pk__{op}': pk}),
+    )
+
+
+class KeysetPage:
+    """一页结果；模板里直接遍历，has_next / next_cursor 用于生成下一页链接"""
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def keyset_page(queryset, field, cursor, per_page, descending=True):
+    queryset = after_cursor(queryset.order_by(*keyset_ordering(field, descending)), field, cursor, descending)
+    rows = list(queryset[:per_page + 1])
+    next_cursor = encode_cursor(rows[per_page - 1], field) if len(rows) > per_page else None
+    return KeysetPage(rows[:per_page], next_cursor)
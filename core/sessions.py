@@ -0,0 +1,28 @@
+# core/sessions.py
+"""
+Session 后端 (SESSION_ENGINE = "core.sessions")
+在 Django 自带的 cache 后端基础上增加 “只刷新过期时间” 的能力：
+Session 没有被修改时不再整体重写，而是隔一段时间对 Redis 执行一次 EXPIRE，
+配合 core.middleware.LazySessionMiddleware 使用
+"""
+from django.conf import settings
+from django.contrib.sessions.backends.cache import SessionStore as CacheSessionStore
+
+
+class SessionStore(CacheSessionStore):
+
+    def needs_touch(self):
+        """
+        距离上次写入 / 刷新超过 SESSION_TOUCH_INTERVAL (且不超过有效期的 1/4，兼容 set_expiry(3600) 这种短 Session)
+        用 Redis 剩余 TTL 推算上次刷新的时间，只读不写
+        """
+        if not hasattr(self._cache, "ttl"):  # 非 django_redis 缓存 (例如测试用的 locmem)
+            return False
+        age = self.get_expiry_age()
+        interval = min(settings.SESSION_TOUCH_INTERVAL, age // 4)
+        ttl = self._cache.ttl(self.cache_key)
+        return ttl is not None and age - ttl >= interval
+
+    def touch(self):
+        """只刷新过期时间，不重写数据；返回 key 是否仍然存在"""
+        return self._cache.touch(self.cache_key, self.get_expiry_age())
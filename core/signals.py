@@ -1,11 +1,14 @@
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.core.cache import cache
 from django.conf import settings
+from constance.signals import config_updated
 
 from blog.models import Post
-from game.models import Game
+from game.models import Game, GameCategory, GameTag
 from account.models import User
+from .page_cache import bump_generation
 
 # 新增(save) 还是 删除(delete)，都触发
 @receiver([post_save, post_delete], sender=Post)
@@ -17,4 +20,19 @@ def clear_dashboard_cache(sender, **kwargs):
     下次访问仪表盘时，会自动重新计算最新数据。
     """
     cache.delete(settings.CACHE_KEYS["DASHBOARD_COUNTS"])
-    # print(f"检测到 {sender.__name__} 变动，已清除仪表盘缓存！") # 开发调试用，生产环境可注释
\ No newline at end of file
+    # print(f"检测到 {sender.__name__} 变动，已清除仪表盘缓存！") # 开发调试用，生产环境可注释
+
+
+# 文章 / 分类 / 标签的变更由 blog/signals.py 在更新导航索引之后再让缓存失效
+@receiver([post_save, post_delete], sender=Game)
+@receiver([post_save, post_delete], sender=GameCategory)
+@receiver([post_save, post_delete], sender=GameTag)
+@receiver(m2m_changed, sender=Game.tags.through)
+@receiver(config_updated)
+def invalidate_page_cache(sender, **kwargs):
+    """
+    页面上展示的内容或站点配置 (constance) 变动时，让匿名访客的整页缓存全部失效
+    阅读量 / 点赞数用 queryset.update 写入，不触发信号，由缓存过期时间兜底
+    事务提交后再 +1：提交前并发的请求会按新代数缓存仍是旧数据的页面
+    """
+    transaction.on_commit(bump_generation, robust=True)
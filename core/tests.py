@@ -1,3 +1,138 @@
-from django.test import TestCase
+import base64
+import json
+from datetime import timedelta
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, tag
+from django.utils import timezone
+
+from blog.models import Category, Post, Tag
+from game.models import Game, GameCategory
+from .pagination import after_cursor, decode_cursor, encode_cursor, keyset_ordering
+
+SEED_POSTS = 100_000
+SEED_GAMES = 10_000
+SEED_BATCH = 5000
+
+# 这些查询允许 filesort (但仍不能全表扫描)：
+# 按标签筛选时先由标签 slug 走唯一索引、中间表走 tag_id 索引，再按主键回表，结果集只能连接后再排序
+FILESORT_ALLOWED = {"文章列表按标签"}
+
+
+def explain_problems(plan):
+    """
+    遍历 MySQL EXPLAIN FORMAT=JSON 的结果，返回其中的全表扫描 / filesort 描述
+    只看 access_type == ALL：按索引顺序读取 (index / range / ref) 都算正常
+    """
+    problems = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get("using_filesort"):
+                problems.append("filesort")
+            if node.get("access_type") == "ALL":
+                problems.append(f"full scan on {node.get('table_name')}")
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(plan)
+    return problems
+
+
+@tag("explain")
+@skipUnless(connection.vendor == "mysql", "EXPLAIN 计划只针对 MySQL")
+class HotQueryPlanTestCase(TransactionTestCase):
+    """
+    热点查询的执行计划回归测试：灌入 10 万篇文章后逐条 EXPLAIN，出现全表扫描或 filesort 即失败
+    灌数据较慢，日常可用 python manage.py test --exclude-tag=explain 跳过
+    ANALYZE TABLE 会隐式提交事务，所以用 TransactionTestCase，所有查询放在同一个用例里只灌一次
+    """
+
+    def seed(self):
+        author = get_user_model().objects.create_user(username="explain", password="x")
+        categories = Category.objects.bulk_create(
+            [Category(name=f"c{i}", slug=f"c{i}") for i in range(20)])
+        tags = Tag.objects.bulk_create([Tag(name=f"t{i}", slug=f"t{i}") for i in range(50)])
+        game_categories = GameCategory.objects.bulk_create(
+            [GameCategory(name=f"g{i}", slug=f"g{i}") for i in range(10)])
+
+        start = timezone.now() - timedelta(days=3650)
+        through = Post.tags.through
+        for offset in range(0, SEED_POSTS, SEED_BATCH):
+            posts = Post.objects.bulk_create([
+                Post(
+                    title=f"p{i}", slug=f"p{i}", content="x", author=author,
+                    category=categories[i % len(categories)],
+                    # 约 5% 为草稿，且每 10 篇有一组相同的发布时间，覆盖 id 兜底排序
+                    status="draft" if i % 20 == 0 else "published",
+                    published_at=None if i % 20 == 0 else start + timedelta(minutes=i - i % 10),
+                )
+                for i in range(offset, min(offset + SEED_BATCH, SEED_POSTS))
+            ])
+            through.objects.bulk_create([
+                through(post_id=post.pk, tag_id=tags[(post.pk + k) % len(tags)].pk)
+                for post in posts for k in (0, 7)
+            ])
+
+        for offset in range(0, SEED_GAMES, SEED_BATCH):
+            Game.objects.bulk_create([
+                Game(title=f"g{i}", slug=f"g{i}", game_file="games/x.html", likes_count=i % 97,
+                     category=game_categories[i % len(game_categories)], is_public=i % 10 != 0)
+                for i in range(offset, min(offset + SEED_BATCH, SEED_GAMES))
+            ])
+
+        tables = [Post._meta.db_table, through._meta.db_table, Game._meta.db_table]
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE TABLE {', '.join(tables)}")
+            cursor.fetchall()
+
+    def hot_queries(self):
+        published = Post.objects.filter(status="published")
+        public_games = Game.objects.filter(is_public=True)
+        middle = published.order_by("published_at")[SEED_POSTS // 2]
+        post_page = published.order_by(*keyset_ordering("published_at"))
+
+        queries = {
+            "首页最新文章": published.order_by("-published_at")[:3],
+            "文章列表第一页": post_page[:10],
+            "文章列表游标翻页": after_cursor(post_page, "published_at", encode_cursor(middle, "published_at"))[:10],
+            "文章列表按分类": post_page.filter(category__slug="c3")[:10],
+            "上一篇": published.filter(published_at__lt=middle.published_at).order_by("-published_at")[:1],
+            "下一篇": published.filter(published_at__gt=middle.published_at).order_by("published_at")[:1],
+            # MAX(updated_at) 与取索引末端的一行走同一个索引
+            "文章最新更新时间": published.order_by("-updated_at").values("updated_at")[:1],
+            "游戏最新更新时间": public_games.order_by("-updated_at").values("updated_at")[:1],
+        }
+        for sort, (field, descending) in {"newest": ("created_at", True), "oldest": ("created_at", False),
+                                          "hot": ("likes_count", True), "cold": ("likes_count", False)}.items():
+            queries[f"游戏列表 {sort}"] = public_games.order_by(*keyset_ordering(field, descending))[:13]
+        # 按标签筛选要经过多对多中间表，只能在连接后排序，见 FILESORT_ALLOWED
+        queries["文章列表按标签"] = post_page.filter(tags__slug="t5")[:10]
+        queries["游戏列表按分类"] = public_games.filter(category__slug="g3").order_by(
+            *keyset_ordering("created_at"))[:13]
+        return queries
+
+    def test_hot_queries_use_indexes(self):
+        self.seed()
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(name):
+                plan = json.loads(queryset.explain(format="json"))
+                problems = explain_problems(plan)
+                if name in FILESORT_ALLOWED:
+                    problems = [problem for problem in problems if problem != "filesort"]
+                self.assertEqual(problems, [], f"{name}: {json.dumps(plan, ensure_ascii=False)}")
+
+
+class CursorTestCase(TestCase):
+
+    def test_cursor_without_sort_value_is_rejected(self):
+        """[null, id] 的游标当作第一页，不能把 None 带进范围查询"""
+        cursor = base64.urlsafe_b64encode(json.dumps([None, 3]).encode()).decode().rstrip("=")
+        self.assertIsNone(decode_cursor(Post, "published_at", cursor))
+        self.assertIsNone(encode_cursor(Post(pk=3), "published_at"))
+        self.assertEqual(self.client.get("/blog/", {"cursor": cursor}).status_code, 200)
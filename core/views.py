@@ -1,10 +1,21 @@
 from django.shortcuts import render
 from blog.models import Post
 from game.models import Game
+from .page_cache import anonymous_page_cache, conditional_page, latest_updated_at
 
+
+def _latest_home(request):
+    return [
+        latest_updated_at("post", Post.objects.filter(status='published')),
+        latest_updated_at("game", Game.objects.filter(is_public=True)),
+    ]
+
+
+@conditional_page(_latest_home)
+@anonymous_page_cache
 def index(request):
     # 1. 获取最新发布的 3 篇文章
-    recent_posts = Post.objects.filter(status='published').select_related('category').order_by('-published_at')[:3]
+    recent_posts = Post.objects.filter(status='published').select_related('category').defer('content').order_by('-published_at')[:3]
     recent_games = Game.objects.filter(is_public=True).order_by('-created_at')[:3]    # 2. (可选) 获取热门文章或推荐文章
 
     context = {
@@ -14,5 +25,7 @@ def index(request):
     return render(request, 'home.html', context)
 
 
+@conditional_page(lambda request: [])
+@anonymous_page_cache
 def roadmap_view(request):
     return render(request, 'core/roadmap_gesp_csp.html')
\ No newline at end of file
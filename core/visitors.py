@@ -0,0 +1,75 @@
+# core/visitors.py
+"""
+访客级别的“看过 / 点赞过 / 解锁过”记录
+以前这些标记逐个写进 Session (has_viewed_post_<id> ...)，读得越多 Session 越大，且每次请求都要整体重写
+现在每个访客一个随机 id (Cookie)，每种标记一个 Redis bitmap：key 按访客区分，偏移量是文章 / 游戏的主键，
+几百篇文章也只占几十字节，并按标记类型设置过期时间
+"""
+import re
+import uuid
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+VISITOR_COOKIE_NAME = "ym_vid"
+VISITOR_COOKIE_AGE = 60 * 60 * 24 * 365
+VISITOR_ID_RE = re.compile(r"[0-9a-f]{32}")
+
+
+def get_visitor_id(request, create=True):
+    """
+    读取访客 id；create=True 时没有则生成一个，由 VisitorIdMiddleware 写回 Cookie
+    只读场景用 create=False，避免给只是路过的爬虫也发 Cookie
+    """
+    visitor_id = getattr(request, "_visitor_id", None)
+    if visitor_id:
+        return visitor_id
+    visitor_id = request.COOKIES.get(VISITOR_COOKIE_NAME, "")
+    if not VISITOR_ID_RE.fullmatch(visitor_id):
+        if not create:
+            return None
+        visitor_id = uuid.uuid4().hex
+        request._visitor_id_is_new = True
+    request._visitor_id = visitor_id
+    return visitor_id
+
+
+class VisitorBitmap:
+    """
+    一种标记 (例如 “看过的文章”) 对应一组 bitmap，每个访客一个 key
+    timeout_key: CACHE_TIMEOUTS 中的过期时间配置名，每次写入都会重新设置过期时间
+    """
+
+    def __init__(self, name, timeout_key):
+        self.name = name
+        self.timeout_key = timeout_key
+
+    def _key(self, visitor_id):
+        return settings.CACHE_KEYS["VISITOR_BITMAP"].format(name=self.name, visitor_id=visitor_id)
+
+    def contains(self, request, object_id):
+        visitor_id = get_visitor_id(request, create=False)
+        if not visitor_id:
+            return False
+        return bool(get_redis_connection("default").getbit(self._key(visitor_id), object_id))
+
+    def _set(self, request, object_id, value):
+        key = self._key(get_visitor_id(request))
+        pipe = get_redis_connection("default").pipeline()
+        pipe.setbit(key, object_id, value)
+        pipe.expire(key, settings.CACHE_TIMEOUTS[self.timeout_key])
+        previous, _ = pipe.execute()
+        return bool(previous)
+
+    def add(self, request, object_id):
+        """打上标记，返回之前是否已经有标记 (检查与写入是原子的，并发请求不会重复计数)"""
+        return self._set(request, object_id, 1)
+
+    def discard(self, request, object_id):
+        """去掉标记，返回之前是否有标记"""
+        return self._set(request, object_id, 0)
+
+
+POST_VIEWS = VisitorBitmap("post_view", "VISITOR_POST_VIEW")
+POST_UNLOCKS = VisitorBitmap("post_unlock", "VISITOR_POST_UNLOCK")
+GAME_LIKES = VisitorBitmap("game_like", "VISITOR_GAME_LIKE")
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0004_game_likes_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['is_public', 'created_at', 'id'], name='game_public_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['is_public', 'likes_count', 'id'], name='game_public_likes_id_idx'),
+        ),
+    ]
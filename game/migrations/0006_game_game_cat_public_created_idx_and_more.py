@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0005_game_game_public_created_id_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['category', 'is_public', 'created_at', 'id'], name='game_cat_public_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['is_public', 'updated_at'], name='game_public_updated_idx'),
+        ),
+    ]
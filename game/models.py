@@ -44,6 +44,15 @@ class Game(models.Model):
     class Meta:
         verbose_name = "小游戏"
         verbose_name_plural = verbose_name
+        indexes = [
+            # 列表页的排序方式：is_public 过滤 + (排序键, id)，升序 / 降序共用
+            models.Index(fields=['is_public', 'created_at', 'id'], name='game_public_created_id_idx'),
+            models.Index(fields=['is_public', 'likes_count', 'id'], name='game_public_likes_id_idx'),
+            # 按分类筛选 + 默认的最新排序
+            models.Index(fields=['category', 'is_public', 'created_at', 'id'], name='game_cat_public_created_idx'),
+            # 条件请求的校验值 MAX(updated_at)
+            models.Index(fields=['is_public', 'updated_at'], name='game_public_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
\ No newline at end of file
@@ -3,10 +3,17 @@ from django.db.models import F
 from .models import GameCategory
 from django.core.paginator import Paginator
 from .models import Game
+from core.pagination import encode_cursor, keyset_ordering, keyset_page
+from core.page_cache import anonymous_page_cache, conditional_page, latest_updated_at, respond_conditionally
+from core.visitors import GAME_LIKES
 import logging
 
 logger = logging.getLogger(__name__)
 
+GAMES_PER_PAGE = 12
+
+@conditional_page(lambda request: [latest_updated_at("game", Game.objects.filter(is_public=True))])
+@anonymous_page_cache
 def game_list(request):
     latest_games = Game.objects.filter(is_public=True).select_related('category').prefetch_related('tags')
 
@@ -16,59 +23,73 @@ def game_list(request):
 
     sort_param = request.GET.get('sort', 'newest')
     sort_options = {
-        'newest': '-created_at',  # 最新发布 (时间降序)
-        'oldest': 'created_at',  # 最早发布 (时间升序)
-        'hot': '-likes_count',  # 点赞最多
-        'cold': 'likes_count',  # 点赞最少
+        'newest': ('created_at', True),  # 最新发布 (时间降序)
+        'oldest': ('created_at', False),  # 最早发布 (时间升序)
+        'hot': ('likes_count', True),  # 点赞最多
+        'cold': ('likes_count', False),  # 点赞最少
     }
-    order_by_field = sort_options.get(sort_param, '-created_at')
-    latest_games = latest_games.order_by(order_by_field)
-
-    paginator = Paginator(latest_games, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    # 生成智能页码范围
-    custom_page_range = paginator.get_elided_page_range(page_obj.number, on_each_side=1, on_ends=1)
+    sort_field, descending = sort_options.get(sort_param, sort_options['newest'])
+    # 排序键 + id 兜底，顺序唯一，(is_public, 排序键, id) 联合索引可以直接按序读取
+    latest_games = latest_games.order_by(*keyset_ordering(sort_field, descending))
 
     context = {
         'categories': GameCategory.objects.all(),
-        'latest_games': page_obj,
-        'custom_page_range': custom_page_range,  # 传给模板用于生成按钮
         'current_category': category_slug,  # 传回当前分类，用于翻页时保持筛选状态
         'current_sort': sort_param
     }
+
+    # 顺序翻页 (“下一页”) 只用游标，不带页码：不执行 COUNT / OFFSET，
+    # 热度排序下点赞数变化也不会出现页码与内容对不上的情况
+    cursor = request.GET.get('cursor')
+    if cursor:
+        page = keyset_page(latest_games, sort_field, cursor, per_page=GAMES_PER_PAGE, descending=descending)
+        context.update({'latest_games': page, 'next_cursor': page.next_cursor, 'cursor_mode': True})
+        return render(request, 'game/list.html', context)
+
+    # 直接点页码时按 OFFSET 读取，页码按钮只在这里生成
+    paginator = Paginator(latest_games, GAMES_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj.object_list = list(page_obj.object_list)
+    next_cursor = None
+    if page_obj.has_next() and page_obj.object_list:
+        next_cursor = encode_cursor(page_obj.object_list[-1], sort_field)
+
+    context.update({
+        'latest_games': page_obj,
+        # 生成智能页码范围
+        'custom_page_range': paginator.get_elided_page_range(page_obj.number, on_each_side=1, on_ends=1),
+        'next_cursor': next_cursor,
+    })
     return render(request, 'game/list.html', context)
 
 
 def game_detail(request, slug):
     game  = get_object_or_404(Game.objects.select_related('category'), slug=slug, is_public=True)
-    like_session_key = f'has_liked_game_{game.id}'
-    is_liked = request.session.get(like_session_key, False)
+    is_liked = GAME_LIKES.contains(request, game.id)
 
 
     context = {
         'game': game,
         'is_liked': is_liked
     }
-    return render(request, 'game/detail.html', context)
+    # 页面因是否已点赞而不同，点赞状态参与 ETag
+    return respond_conditionally(request, [game.updated_at], lambda: render(request, 'game/detail.html', context),
+                                 variant=f"liked={is_liked}")
 
 
 def like_game(request, slug):
     game = get_object_or_404(Game, slug=slug, is_public=True)
-    like_session_key = f'has_liked_game_{game.id}'
-    is_liked = request.session.get(like_session_key, False)
+    is_liked = GAME_LIKES.contains(request, game.id)
 
     if request.method == "POST":
+        # discard / add 返回修改前的状态，并发的重复点击只会生效一次
         if is_liked:
-            if game.likes_count > 0:
+            if GAME_LIKES.discard(request, game.id) and game.likes_count > 0:
                 Game.objects.filter(pk=game.pk).update(likes_count=F('likes_count') - 1)
-
-            del request.session[like_session_key]
             is_liked = False
         else:
-            Game.objects.filter(pk=game.pk).update(likes_count=F('likes_count') + 1)
-
-            request.session[like_session_key] = True
+            if not GAME_LIKES.add(request, game.id):
+                Game.objects.filter(pk=game.pk).update(likes_count=F('likes_count') + 1)
             is_liked = True
 
         game.refresh_from_db()
@@ -0,0 +1,51 @@
+// static/admin/js/admin_markdown_preview.js
+// 文章编辑器的预览改为请求后端渲染 (与前台完全一致：代码高亮、公式、标题 id)
+// 后端按块缓存，打字时只会重新渲染改动的那一块
+
+window.addEventListener("load", function() {
+    const previewUrl = window.location.pathname.split("/blog/post/")[0] + "/blog/post/preview/";
+    const csrfInput = document.querySelector("[name=csrfmiddlewaretoken]");
+
+    document.querySelectorAll('textarea[id^="markdown-"]').forEach(function(textarea) {
+        const easymde = textarea.easymde;
+        if (!easymde) {
+            return;
+        }
+
+        let timer = null;
+        let controller = null;
+        let lastHtml = "";
+
+        // EasyMDE 的 previewRender 必须同步返回；先返回上一次的结果，拿到新结果后再替换
+        easymde.options.previewRender = function(plainText, preview) {
+            clearTimeout(timer);
+            timer = setTimeout(function() {
+                if (controller) {
+                    controller.abort();
+                }
+                controller = new AbortController();
+                const body = new FormData();
+                body.append("content", plainText);
+                fetch(previewUrl, {
+                    method: "POST",
+                    body: body,
+                    headers: {"X-CSRFToken": csrfInput ? csrfInput.value : ""},
+                    signal: controller.signal,
+                })
+                    .then(res => res.json())
+                    .then(data => {
+                        if (data.html !== undefined) {
+                            lastHtml = data.html;
+                            preview.innerHTML = lastHtml;  // admin_katex_config.js 会监听到变化并渲染公式
+                        }
+                    })
+                    .catch(err => {
+                        if (err.name !== "AbortError") {
+                            console.error("Markdown preview error:", err);
+                        }
+                    });
+            }, 300);
+            return lastHtml || preview.innerHTML || "<p>渲染中...</p>";
+        };
+    });
+});
@@ -1,19 +1,46 @@
 # tools/ai_utils.py
+import asyncio
+import hashlib
 import json
+import weakref
 from openai import AsyncOpenAI
 from django.conf import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
-client = AsyncOpenAI(
-    api_key=settings.LLM_API_KEY,
-    base_url=settings.LLM_API_URL
-)
+# 每个事件循环一个客户端：Celery threads 池里每个线程经 async_to_sync 各自运行事件循环，
+# 共享同一个 AsyncOpenAI 会把连接池里的连接带到别的 (甚至已关闭的) 事件循环上
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncOpenAI(
+            api_key=settings.LLM_API_KEY,
+            base_url=settings.LLM_API_URL,
+            timeout=settings.LLM_REQUEST_TIMEOUT,
+            max_retries=1,
+        )
+    return client
+
+
+async def aclose_client():
+    """关闭当前事件循环上的客户端 (ASGI lifespan shutdown 时调用)"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client:
+        await client.close()
+
+
+LLM_MODEL = "deepseek-chat"
 
 # ======================================================
 # 模块化 Prompt 组件 (v6.5 - 多样化边界版)
+# 修改任何 Prompt 内容后都要同步修改 PROMPT_VERSION，使旧的生成结果缓存失效
 # ======================================================
+PROMPT_VERSION = "v6.5"
 
 Tick3 = "```"
 
@@ -198,10 +225,21 @@ DES_SOL = r"""
 """
 
 
-async def generate_gen_script(description, solution, mode="algo"):
+def generation_digest(description, solution, mode):
     """
-    根据 mode 组装 Prompt，并调用 AI 生成代码
+    同一题目 + 标程 + 模式 + Prompt 版本 + 模型 的请求视为相同请求
+    首尾空白和换行符差异不影响结果
     """
+    if mode not in STRATEGIES:
+        mode = "algo"
+    parts = [PROMPT_VERSION, LLM_MODEL, mode,
+             (description or "").replace("\r\n", "\n").strip(),
+             (solution or "").replace("\r\n", "\n").strip()]
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+def build_prompt(description, solution, mode="algo"):
+    """根据 mode 组装 Prompt，返回 (实际使用的 mode, 完整 Prompt)"""
     # 1. 默认兜底
     if mode not in STRATEGIES:
         mode = "algo"
@@ -213,41 +251,291 @@ async def generate_gen_script(description, solution, mode="algo"):
     task_context = DES_SOL.format(description=description, solution=solution)
 
     # 拼接最终 Prompt
-    full_prompt = COMMON_HEADER + strategy_content + COMMON_FOOTER + task_context
+    return mode, COMMON_HEADER + strategy_content + COMMON_FOOTER + task_context
+
+
+def _llm_messages(full_prompt):
+    return [
+        {"role": "system", "content": "你是一个严谨的算法专家，只输出 JSON。"},
+        {"role": "user", "content": full_prompt},
+    ]
+
+
+def parse_completion(content):
+    """解析模型返回的完整 JSON，返回结果字典"""
+    content = content.replace("```json", "").replace("```", "").strip()
+    data = json.loads(content)
+    return {
+        "gen_code": data.get('gen_code', ''),
+        "val_code": data.get('val_code', ''),
+        "analysis": data.get('analysis', 'AI 未提供分析'),
+        "plan": data.get('plan', 'AI 未提供计划')
+    }
+
+
+def fallback_result():
+    """保底返回"""
+    fallback_gen = "import sys, random\nrandom.seed(int(sys.argv[1]) if len(sys.argv)>1 else 0)\nprint(10)\nimport sys; sys.stdout.flush()"
+    fallback_val = "import sys\n# 默认校验通过\npass"
+    return {
+        "gen_code": fallback_gen,
+        "val_code": fallback_val,
+        "analysis": "生成发生错误，已回退到保底模式。",
+        "plan": "Error Fallback",
+        "fallback": True,  # 保底结果不写入缓存
+    }
+
+
+async def generate_gen_script(description, solution, mode="algo", temperature=0.7):
+    """
+    根据 mode 组装 Prompt，并调用 AI 生成代码
+    """
+    mode, full_prompt = build_prompt(description, solution, mode)
 
     try:
-        response = await client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": "你是一个严谨的算法专家，只输出 JSON。"},
-                {"role": "user", "content": full_prompt},
-            ],
+        response = await get_client().chat.completions.create(
+            model=LLM_MODEL,
+            messages=_llm_messages(full_prompt),
             response_format={"type": "json_object"},
-            temperature=0.7
+            temperature=temperature
         )
         content = response.choices[0].message.content
-        content = content.replace("```json", "").replace("```", "").strip()
         logger.info(f"AI Code Generated (Mode: {mode})")
 
-        # 解析返回的 JSON
-        data = json.loads(content)
+        # 解析返回的 JSON，返回完整数据字典
+        return parse_completion(content)
+
+    except Exception as e:
+        logger.exception(f"AI 生成失败: {e}")
+        return fallback_result()
+
+
+# ======================================================
+# 流式生成：边接收 token 边解析出各字段的增量文本
+# ======================================================
+_JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class PartialJSONFields:
+    """
+    增量解析顶层 JSON 对象中的字符串字段
+    每次 feed 一段文本，返回本段新增的 [(字段名, 新增文本), ...]，整体只扫描一遍
+    非字符串的值 (数字 / 数组 / 嵌套对象) 直接跳过
+    """
 
-        # 返回完整数据字典
-        return {
-            "gen_code": data.get('gen_code', ''),
-            "val_code": data.get('val_code', ''),
-            "analysis": data.get('analysis', 'AI 未提供分析'),
-            "plan": data.get('plan', 'AI 未提供计划')
-        }
+    def __init__(self):
+        self.values = {}
+        self._state = "start"
+        self._key = []
+        self._current = None
+        self._escape = None  # None: 非转义; "": 刚读到反斜杠; "uXXXX": 正在读 \u 转义
+        self._high_surrogate = None
+        self._depth = 0
+        self._in_nested_str = False
+        self._nested_escape = False
+
+    def feed(self, chunk):
+        deltas = {}
+        for ch in chunk:
+            text = self._step(ch)
+            if text:
+                deltas[self._current] = deltas.get(self._current, "") + text
+        for field, text in deltas.items():
+            self.values[field] = self.values.get(field, "") + text
+        return list(deltas.items())
+
+    def _step(self, ch):
+        state = self._state
+        if state == "start":
+            if ch == "{":
+                self._state = "key"
+        elif state == "key":
+            if ch == '"':
+                self._key = []
+                self._state = "in_key"
+            elif ch == "}":
+                self._state = "done"
+        elif state == "in_key":
+            if self._escape is not None:  # 字段名只处理单字符转义
+                self._key.append(_JSON_ESCAPES.get(ch, ch))
+                self._escape = None
+            elif ch == '"':
+                self._current = "".join(self._key)
+                self._state = "colon"
+            elif ch == "\\":
+                self._escape = ""
+            else:
+                self._key.append(ch)
+        elif state == "colon":
+            if ch == ":":
+                self._state = "value"
+        elif state == "value":
+            if ch == '"':
+                self._state = "in_str"
+            elif not ch.isspace():
+                self._depth = 1 if ch in "[{" else 0
+                self._state = "in_other"
+                if self._depth == 0 and ch in ",}":
+                    self._state = "key" if ch == "," else "done"
+        elif state == "in_str":
+            return self._step_string(ch)
+        elif state == "in_other":
+            self._step_other(ch)
+        return None
+
+    def _step_string(self, ch):
+        if self._escape is None:
+            if ch == '"':
+                self._state = "key"
+                return None
+            if ch == "\\":
+                self._escape = ""
+                return None
+            return ch
+        if self._escape == "":
+            if ch == "u":
+                self._escape = "u"
+                return None
+            self._escape = None
+            return _JSON_ESCAPES.get(ch, ch)
+        # \uXXXX
+        self._escape += ch
+        if len(self._escape) < 5:
+            return None
+        code = int(self._escape[1:], 16)
+        self._escape = None
+        if 0xD800 <= code <= 0xDBFF:
+            self._high_surrogate = code
+            return None
+        if 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+            self._high_surrogate = None
+        return chr(code)
+
+    def _step_other(self, ch):
+        if self._in_nested_str:
+            if self._nested_escape:
+                self._nested_escape = False
+            elif ch == "\\":
+                self._nested_escape = True
+            elif ch == '"':
+                self._in_nested_str = False
+        elif ch == '"':
+            self._in_nested_str = True
+        elif ch in "[{":
+            self._depth += 1
+        elif ch in "]}":
+            if self._depth == 0:
+                self._state = "done"
+            else:
+                self._depth -= 1
+        elif ch == "," and self._depth == 0:
+            self._state = "key"
+
+
+async def generate_gen_script_stream(description, solution, mode="algo", on_delta=None):
+    """
+    流式版本的 generate_gen_script
+    每收到一段 token 就解析出各字段 (analysis / plan / gen_code / val_code) 的新增文本，
+    回调 on_delta(字段名, 新增文本)；结束后返回与非流式版本相同的结果字典
+    """
+    mode, full_prompt = build_prompt(description, solution, mode)
+    parser = PartialJSONFields()
+    chunks = []
+
+    try:
+        stream = await get_client().chat.completions.create(
+            model=LLM_MODEL,
+            messages=_llm_messages(full_prompt),
+            response_format={"type": "json_object"},
+            temperature=0.7,
+            stream=True,
+        )
+        async for event in stream:
+            if not event.choices:
+                continue
+            text = event.choices[0].delta.content
+            if not text:
+                continue
+            chunks.append(text)
+            if on_delta:
+                for field, delta in parser.feed(text):
+                    on_delta(field, delta)
+
+        logger.info(f"AI Code Generated (Mode: {mode}, stream)")
+        return parse_completion("".join(chunks))
 
     except Exception as e:
         logger.exception(f"AI 生成失败: {e}")
-        # 保底返回
-        fallback_gen = "import sys, random\nrandom.seed(int(sys.argv[1]) if len(sys.argv)>1 else 0)\nprint(10)\nimport sys; sys.stdout.flush()"
-        fallback_val = "import sys\n# 默认校验通过\npass"
-        return {
-            "gen_code": fallback_gen,
-            "val_code": fallback_val,
-            "analysis": "生成发生错误，已回退到保底模式。",
-            "plan": "Error Fallback"
-        }
\ No newline at end of file
+        return fallback_result()
+
+
+# ======================================================
+# 多候选并行：同时请求多份代码，第一份通过沙箱试跑的胜出
+# ======================================================
+MAX_CANDIDATES = 3
+# 每种题型的候选组合 (mode, temperature)，第一项与单次生成完全相同
+CANDIDATE_VARIANTS = {
+    "basic": [("basic", 0.7), ("basic", 0.3), ("basic", 1.0)],
+    "algo": [("algo", 0.7), ("algo", 0.3), ("basic", 0.5)],
+    "graph": [("graph", 0.7), ("graph", 0.3), ("graph", 1.0)],
+}
+
+
+async def generate_first_valid(description, solution, mode="algo", n=MAX_CANDIDATES,
+                               validate=None, on_progress=None):
+    """
+    并行请求 n 份候选代码，每份一返回就交给 validate(gen_code, val_code) 试跑
+    validate 返回 (是否通过, 错误信息)；第一份通过的立即返回，其余请求全部取消
+    全部失败时返回第一份非保底结果，并在 analysis 中附上试跑错误
+    on_progress(序号, 状态, 附加信息) 用于向前端推送各候选的进度
+    """
+    if mode not in STRATEGIES:
+        mode = "algo"
+    variants = CANDIDATE_VARIANTS[mode][:max(1, min(int(n), MAX_CANDIDATES))]
+
+    def report(index, status, detail=None):
+        if on_progress:
+            on_progress(index, status, detail)
+
+    async def attempt(index, variant_mode, temperature):
+        report(index, "generating", {"mode": variant_mode, "temperature": temperature})
+        result = await generate_gen_script(description, solution, variant_mode, temperature)
+        if result.get("fallback"):
+            return index, result, "AI 生成失败"
+        if not validate:
+            return index, result, None
+        report(index, "validating")
+        ok, error = await validate(result["gen_code"], result["val_code"])
+        return index, result, None if ok else error
+
+    tasks = [asyncio.create_task(attempt(i, m, t)) for i, (m, t) in enumerate(variants)]
+    failures = []
+    try:
+        for future in asyncio.as_completed(tasks):
+            try:
+                index, result, error = await future
+            except Exception as e:
+                logger.exception(f"候选生成异常: {e}")
+                continue
+            if error is None:
+                report(index, "passed")
+                result["candidate"] = {"index": index, "mode": variants[index][0],
+                                       "temperature": variants[index][1], "tried": len(failures) + 1}
+                return result
+            report(index, "failed", {"error": error})
+            failures.append((index, result, error))
+    finally:
+        for task in tasks:
+            task.cancel()
+        # 等待被取消的请求真正结束，释放 HTTP 连接
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    usable = [f for f in failures if not f[1].get("fallback")]
+    if not usable:
+        return fallback_result()
+    index, result, error = min(usable, key=lambda f: f[0])
+    result["analysis"] = f"⚠️ {len(variants)} 份候选均未通过沙箱试跑，以下为候选 #{index + 1}，试跑错误：\n{error}\n\n" \
+                         + result.get("analysis", "")
+    result["validation_failed"] = True
+    return result
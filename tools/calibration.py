@@ -0,0 +1,213 @@
+# tools/calibration.py
+"""
+时限校准：在最大的几组测试点上重复运行标程，
+用固定的测速程序把耗时换算到“参考机器”上，给出推荐时限并写入数据包清单 (manifest)
+"""
+import hashlib
+import math
+import os
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .clients import judge_client
+from .judge_utils import (
+    compile_cpp, run_cpp_binary, upload_cached_file, delete_cached_files,
+    summarize_samples, BENCHMARK_MAX_REPEAT, HIGH_VARIANCE_CV,
+)
+
+MANIFEST_VERSION = 1
+
+# 测速程序：固定的整数运算 + 随机访存，不读输入，输出校验和防止被优化掉
+SPEED_BASELINE_CPP = r"""
+#include <cstdio>
+#include <cstdint>
+#include <vector>
+int main() {
+    const int N = 1 << 22;
+    std::vector<uint32_t> a(N);
+    uint64_t x = 88172645463325252ULL, sum = 0;
+    for (int i = 0; i < N; i++) {
+        x ^= x << 13; x ^= x >> 7; x ^= x << 17;
+        a[i] = (uint32_t)x;
+    }
+    for (int round = 0; round < 8; round++) {
+        for (int i = 0; i < N; i++) {
+            uint32_t j = a[i] & (N - 1);
+            sum += a[j] ^ (uint32_t)(i * 2654435761u);
+            a[j] += (uint32_t)sum;
+        }
+    }
+    printf("%llu\n", (unsigned long long)sum);
+    return 0;
+}
+"""
+REFERENCE_BASELINE_MS = 200.0  # 测速程序在参考机器上的 CPU 时间，推荐时限以此为准
+BASELINE_REPEAT = 5
+
+CALIBRATION_MAX_CASES = 3  # 只在最大的几组数据上校准
+CALIBRATION_CPU_LIMIT = 10000000000  # 校准时放宽到 10 秒，慢标程也能测出耗时
+CALIBRATION_OUTPUT_MAX = 64 * 1024 * 1024
+DEFAULT_SAFETY_FACTOR = 2.5
+TL_MIN_MS = 500
+TL_ROUND_MS = 100
+
+
+def _baseline_cache_key():
+    host = hashlib.md5(settings.GO_JUDGE_BASE_URL.encode()).hexdigest()[:12]
+    return settings.CACHE_KEYS["JUDGE_SPEED_BASELINE"].format(host=host)
+
+
+async def measure_speed_baseline(client, refresh=False):
+    """
+    测量当前评测机跑测速程序的 CPU 时间 (ms)，按评测机地址缓存 24 小时
+    返回: (baseline_ms, error)
+    """
+    key = _baseline_cache_key()
+    if not refresh:
+        cached = await cache.aget(key)
+        if cached:
+            return cached, None
+
+    file_id, error, _ = await compile_cpp(client, SPEED_BASELINE_CPP, exe_name="baseline", use_pch=False)
+    if not file_id:
+        return None, f"测速程序编译失败: {error}"
+    try:
+        samples = []
+        for _ in range(BASELINE_REPEAT):
+            result = await run_cpp_binary(client, file_id, "", exe_name="baseline")
+            if result['status'] != 'Accepted':
+                return None, f"测速程序运行失败: {result['status']}"
+            samples.append(result.get('time', 0) / 1000000)
+    finally:
+        await delete_cached_files(client, file_id)
+
+    baseline_ms = summarize_samples(samples)["median"]
+    await cache.aset(key, baseline_ms, timeout=settings.CACHE_TIMEOUTS["JUDGE_SPEED_BASELINE"])
+    return baseline_ms, None
+
+
+def read_case_input(item):
+    """测试点输入可能是字符串，也可能是落盘的大文件 (__FILE_PATH__:路径)"""
+    content = item.get('input', '')
+    if content.startswith("__FILE_PATH__:"):
+        path = content.split(":", 1)[1]
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+    return content.encode('utf-8')
+
+
+def _case_input_size(item):
+    content = item.get('input', '')
+    if content.startswith("__FILE_PATH__:"):
+        path = content.split(":", 1)[1]
+        return os.path.getsize(path) if os.path.exists(path) else -1
+    return len(content.encode('utf-8'))
+
+
+def pick_largest_cases(cases, limit=CALIBRATION_MAX_CASES):
+    """按输入大小取最大的 limit 组测试点"""
+    return sorted(cases, key=_case_input_size, reverse=True)[:limit]
+
+
+def recommend_time_limit(reference_ms, safety_factor=DEFAULT_SAFETY_FACTOR):
+    """参考机器上的最坏耗时 × 安全系数，向上取整到 100ms"""
+    raw = max(reference_ms * safety_factor, TL_MIN_MS)
+    return int(math.ceil(raw / TL_ROUND_MS) * TL_ROUND_MS)
+
+
+def host_time_limit(manifest, baseline_ms):
+    """把清单中的 (参考机器) 时限换算到测速结果为 baseline_ms 的评测机上"""
+    return int(math.ceil(manifest["time_limit_ms"] * baseline_ms / manifest["reference_baseline_ms"]))
+
+
+async def calibrate_time_limit(solution, cases, repeat=5, safety_factor=DEFAULT_SAFETY_FACTOR):
+    """
+    在最大的几组数据上重复运行标程 repeat 次 (各组轮流运行，抵消负载漂移)
+    返回: (manifest, error)
+    """
+    repeat = max(1, min(int(repeat), BENCHMARK_MAX_REPEAT))
+    safety_factor = max(1.0, float(safety_factor))
+    targets = pick_largest_cases(cases)
+    if not targets:
+        return None, "没有可用的 Accepted 测试点"
+
+    async with judge_client(timeout=60.0) as client:
+        baseline_ms, error = await measure_speed_baseline(client)
+        if error:
+            return None, error
+
+        sol_id, error, _ = await compile_cpp(client, solution, src_name="sol.cpp", exe_name="sol")
+        if not sol_id:
+            return None, f"标程编译失败: {error}"
+
+        input_ids = {}
+        try:
+            # 输入只上传一次，之后各轮都直接引用缓存文件
+            for item in targets:
+                content = read_case_input(item)
+                if content is None:
+                    return None, f"测试点 #{item['id']} 的输入已过期，请重新生成数据"
+                input_ids[item['id']] = await upload_cached_file(client, content, f"{item['id']}.in")
+                if not input_ids[item['id']]:
+                    return None, f"测试点 #{item['id']} 上传失败"
+
+            samples = {item['id']: [] for item in targets}
+            outputs = {}
+            for _ in range(repeat):
+                for item in targets:
+                    result = await run_cpp_binary(client, sol_id, None, exe_name="sol",
+                                                  cpu_limit=CALIBRATION_CPU_LIMIT,
+                                                  output_max=CALIBRATION_OUTPUT_MAX,
+                                                  input_file_id=input_ids[item['id']])
+                    if result['status'] != 'Accepted':
+                        return None, f"测试点 #{item['id']} 运行失败: {result['status']}"
+                    samples[item['id']].append(result.get('time', 0) / 1000000)
+                    outputs[item['id']] = result['files'].get('stdout', '')
+        finally:
+            await delete_cached_files(client, sol_id, *input_ids.values())
+
+    # 换算系数：当前评测机比参考机器慢多少
+    speed_factor = baseline_ms / REFERENCE_BASELINE_MS
+    rows, warnings = [], []
+    for item in targets:
+        stats = summarize_samples(samples[item['id']])
+        rows.append({
+            "id": item['id'],
+            "input_bytes": _case_input_size(item),
+            "median_ms": stats["median"],
+            "p90_ms": stats["p90"],
+            "cv": stats["cv"],
+            "reference_ms": round(stats["p90"] / speed_factor, 3),
+            "output_matches": outputs[item['id']].rstrip() == item.get('output', '').rstrip(),
+        })
+        if stats["cv"] > HIGH_VARIANCE_CV:
+            warnings.append(f"测试点 #{item['id']} 耗时波动过大 (CV={stats['cv'] * 100:.1f}%)，建议增加运行次数")
+        if not rows[-1]["output_matches"]:
+            warnings.append(f"测试点 #{item['id']} 重新运行的输出与数据包不一致，标程可能存在未定义行为")
+
+    reference_ms = max(row["reference_ms"] for row in rows)
+    time_limit_ms = recommend_time_limit(reference_ms, safety_factor)
+    if time_limit_ms == TL_MIN_MS and reference_ms * safety_factor < TL_MIN_MS / 2:
+        warnings.append("最大数据耗时远低于推荐时限，数据可能不足以卡掉低效做法")
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "calibrated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "flags": "-O2",
+        "repeat": repeat,
+        "safety_factor": safety_factor,
+        "reference_baseline_ms": REFERENCE_BASELINE_MS,
+        "host_baseline_ms": baseline_ms,
+        "speed_factor": round(speed_factor, 3),
+        "reference_time_ms": reference_ms,
+        "time_limit_ms": time_limit_ms,
+        "host_time_limit_ms": host_time_limit({"time_limit_ms": time_limit_ms,
+                                               "reference_baseline_ms": REFERENCE_BASELINE_MS}, baseline_ms),
+        "cases": rows,
+        "warnings": warnings,
+    }
+    return manifest, None
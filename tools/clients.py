@@ -0,0 +1,72 @@
+# tools/clients.py
+"""
+共享的 Go-Judge HTTP 客户端与异步 Redis 客户端 (SSE 推送用)
+ASGI 部署时由 lifespan 在服务启动时创建、关闭时释放，所有请求复用同一个连接池；
+WSGI / Celery / 管理命令下没有常驻事件循环，退回到每次调用临时创建客户端
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+import redis.asyncio as aioredis
+from django.conf import settings
+
+JUDGE_HTTP_TIMEOUT = 60.0
+JUDGE_HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+
+_shared = {"client": None, "redis": None, "loop": None}
+
+
+async def open_shared_clients():
+    """ASGI lifespan startup"""
+    _shared["client"] = httpx.AsyncClient(timeout=JUDGE_HTTP_TIMEOUT, limits=JUDGE_HTTP_LIMITS)
+    _shared["redis"] = _new_redis()
+    _shared["loop"] = asyncio.get_running_loop()
+
+
+async def close_shared_clients():
+    """ASGI lifespan shutdown：释放 Go-Judge、Redis 与 LLM 的连接池"""
+    from .ai_utils import aclose_client
+
+    client, redis = _shared["client"], _shared["redis"]
+    _shared["client"], _shared["redis"], _shared["loop"] = None, None, None
+    if client:
+        await client.aclose()
+    if redis:
+        await redis.aclose()
+    await aclose_client()
+
+
+def _new_redis():
+    return aioredis.from_url(settings.CACHES["default"]["LOCATION"])
+
+
+@asynccontextmanager
+async def judge_client(timeout=JUDGE_HTTP_TIMEOUT):
+    """
+    async with judge_client() as client: ...
+    当前事件循环上有共享客户端就直接复用 (不关闭)，否则临时创建一个
+    """
+    shared = _shared["client"]
+    if shared is not None and _shared["loop"] is asyncio.get_running_loop():
+        yield shared
+        return
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        yield client
+
+
+@asynccontextmanager
+async def redis_client():
+    """
+    async with redis_client() as conn: ...
+    与 judge_client 相同：当前事件循环上有共享客户端就复用 (不关闭)，否则临时创建一个
+    """
+    shared = _shared["redis"]
+    if shared is not None and _shared["loop"] is asyncio.get_running_loop():
+        yield shared
+        return
+    conn = _new_redis()
+    try:
+        yield conn
+    finally:
+        await conn.aclose()
@@ -0,0 +1,128 @@
+# tools/complexity.py
+"""
+根据测试点的 (输入规模 n, 运行时间/内存) 拟合经验复杂度
+对每个候选模型 y = a + b * f(n) 做最小二乘拟合，取残差最小者
+"""
+import math
+import re
+
+# 候选模型 (按复杂度从低到高排列，残差接近时优先选择更低阶的模型)
+COMPLEXITY_MODELS = {
+    "O(1)": lambda n: 0.0,
+    "O(log n)": lambda n: math.log2(n),
+    "O(n)": lambda n: float(n),
+    "O(n log n)": lambda n: n * math.log2(n),
+    "O(n^2)": lambda n: float(n) ** 2,
+    "O(n^2 log n)": lambda n: float(n) ** 2 * math.log2(n),
+    "O(n^3)": lambda n: float(n) ** 3,
+    "O(2^n)": lambda n: 2.0 ** n if n <= 60 else math.inf,
+}
+
+MIN_POINTS = 3  # 至少需要 3 个不同规模的测试点
+RSS_TOLERANCE = 1.05  # 残差在最优值 5% 以内视为同样好，取更低阶的模型
+WEAK_DATA_RATIO = 0.5  # 测试数据最大 n 不到题目上限的一半时提示数据偏弱
+
+_INT_RE = re.compile(rb'-?\d+')
+
+
+def parse_input_size(preview: bytes):
+    """取输入的第一个整数作为规模 n (绝大多数题目首行即为 N)"""
+    match = _INT_RE.search(preview[:256] if preview else b"")
+    if not match:
+        return None
+    n = int(match.group())
+    return n if n > 0 else None
+
+
+def _fit(xs, ys):
+    """
+    y = a + b * x 的最小二乘闭式解，约束 a >= 0, b >= 0
+    返回 (a, b, rss)
+    """
+    k = len(xs)
+    sx, sy = sum(xs), sum(ys)
+    sxx = sum(x * x for x in xs)
+    sxy = sum(x * y for x, y in zip(xs, ys))
+    den = k * sxx - sx * sx
+
+    if den > 0:
+        b = (k * sxy - sx * sy) / den
+        a = (sy - b * sx) / k
+    else:  # 所有 x 相同 (例如 O(1) 模型)
+        a, b = sy / k, 0.0
+
+    if b < 0:
+        a, b = sy / k, 0.0
+    elif a < 0:
+        a, b = 0.0, (sxy / sxx if sxx else 0.0)
+
+    rss = sum((y - a - b * x) ** 2 for x, y in zip(xs, ys))
+    return a, b, rss
+
+
+def fit_complexity(points, max_n=None):
+    """
+    points: [(n, y), ...]
+    对所有候选模型拟合，返回最优模型、拟合优度以及在 max_n 处的预测值
+    """
+    points = [(n, y) for n, y in points if n and n > 0 and y is not None]
+    if len({n for n, _ in points}) < MIN_POINTS:
+        return None
+
+    ns = [n for n, _ in points]
+    ys = [float(y) for _, y in points]
+    mean_y = sum(ys) / len(ys)
+    tss = sum((y - mean_y) ** 2 for y in ys)
+
+    fits = []
+    for name, func in COMPLEXITY_MODELS.items():
+        xs = [func(n) for n in ns]
+        if any(math.isinf(x) for x in xs):
+            continue
+        a, b, rss = _fit(xs, ys)
+        fits.append((name, func, a, b, rss))
+
+    best_rss = min(rss for *_, rss in fits)
+    name, func, a, b, rss = next(f for f in fits if f[4] <= best_rss * RSS_TOLERANCE + 1e-9)
+
+    result = {
+        "model": name,
+        "r2": round(1 - rss / tss, 4) if tss else 1.0,
+        "intercept": round(a, 4),
+        "coef": b,
+        "projected": None,
+    }
+    if max_n:
+        x = func(max_n)
+        result["projected"] = round(a + b * x, 2) if not math.isinf(x) else None
+    return result
+
+
+def estimate_complexity(results, max_n=None, time_limit_ms=1000):
+    """
+    根据一批测试点的运行结果估计标程的时间/空间复杂度
+    results: judge_utils._run_pipeline 的返回列表 (需包含 n / time_us / memory)
+    """
+    accepted = [r for r in results if r.get('status') == 'Accepted' and r.get('n')]
+    time_fit = fit_complexity([(r['n'], r['time_us'] / 1000) for r in accepted], max_n)
+    if not time_fit:
+        return {"status": "insufficient", "message": f"有效测试点少于 {MIN_POINTS} 种规模，无法估计复杂度"}
+
+    memory_fit = fit_complexity([(r['n'], r['memory']) for r in accepted], max_n)
+    data_max_n = max(r['n'] for r in accepted)
+
+    warnings = []
+    if max_n:
+        if data_max_n < max_n * WEAK_DATA_RATIO:
+            warnings.append(f"测试数据最大 n={data_max_n}，远小于题目上限 {max_n}，数据可能偏弱")
+        if time_fit["projected"] is None or time_fit["projected"] > time_limit_ms:
+            warnings.append(f"按 {time_fit['model']} 推算，标程在 n={max_n} 时可能超过 {time_limit_ms}ms")
+
+    return {
+        "status": "OK",
+        "data_max_n": data_max_n,
+        "max_n": max_n,
+        "time": time_fit,  # 单位 ms
+        "memory": memory_fit,  # 单位 KB
+        "warnings": warnings,
+    }
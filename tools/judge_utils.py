@@ -1,7 +1,12 @@
-import httpx
 from django.conf import settings
+from judge.services import STD_MAP
+from .clients import judge_client
+from .complexity import parse_input_size
 import asyncio
 import logging
+import math
+import re
+import statistics
 import tempfile
 import os
 
@@ -10,6 +15,29 @@ logger = logging.getLogger(__name__)
 LARGE_FILE_THRESHOLD = 1024 * 1024  # 1MB 阈值
 PREVIEW_SIZE = 4096  # 4KB
 
+CPP_COMPILER = "/usr/bin/g++"
+DEFAULT_CPP_STD = "c++14"
+
+# 预编译头：每个 (-std, -O) 组合一份，目录结构为 {PCH_ROOT}/{std}-{opt}/bits/stdc++.h.gch
+PCH_HEADER = "bits/stdc++.h"
+PCH_OPT_LEVELS = ("-O0", "-O2")
+_FIRST_INCLUDE_RE = re.compile(r'^\s*#\s*include\s*[<"]([^>"]+)[>"]', re.MULTILINE)
+
+# 编译选项对比模式可选的档位
+COMPILE_PROFILES = {
+    "O0": ("-O0",),
+    "O2": ("-O2",),
+    "O3": ("-O3",),
+    "O3-native": ("-O3", "-march=native"),
+    "O2-lto": ("-O2", "-flto"),
+}
+DEFAULT_COMPARE_PROFILES = ["O2", "O3", "O3-native", "O2-lto"]
+COMPILE_PARALLELISM = 2  # 2C 服务器，最多同时编译 2 份
+SANDBOX_CONCURRENCY = 3  # 同一批任务最多同时占用 3 个沙箱
+
+BENCHMARK_MAX_REPEAT = 20  # 单次基准测试最多运行次数
+HIGH_VARIANCE_CV = 0.10  # 变异系数超过 10% 视为波动过大
+
 # ==========================================
 # 核心：Python 驱动脚本
 # ==========================================
@@ -74,34 +102,367 @@ def pick_scale(total_cases, idx):
 async def compile_solution_cached(code):
     """Step 1: 编译标程并缓存"""
     # 🌟 修改点1：增加 timeout，防止编译超时导致系统错误
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        payload = {
-            "cmd": [{
-                "args": ["/usr/bin/g++", "sol.cpp", "-O2", "-std=c++14", "-o", "sol"],
-                "env": ["PATH=/usr/bin:/bin"],
-                "files": [
-                    {"content": ""},
-                    {"name": "stdout", "max": 1024},
-                    {"name": "stderr", "max": 10240}
-                ],
-                "cpuLimit": 10000000000,
-                "memoryLimit": settings.MEMORY_LIMIT_BYTES,
-                "copyIn": {"sol.cpp": {"content": code}},
-                "procLimit": 10,
-                "copyOutCached": ["sol"]
-            }]
-        }
+    async with judge_client(timeout=60.0) as client:
         try:
-            res = await client.post(f"{settings.GO_JUDGE_BASE_URL}/run", json=payload)
-            if res.status_code != 200: return None, f"Judge Server Error: {res.text}"
-            result = res.json()[0]
-            if result['status'] != 'Accepted': return None, result['files'].get('stderr', 'Compile Error')
-            return result['fileIds']['sol'], None
+            file_id, error, _ = await compile_cpp(client, code, src_name="sol.cpp", exe_name="sol")
+            return file_id, error
         except Exception as e:
             logger.exception(f"Compile Error: {e}")
             return None, str(e)
 
 
+# ==========================================
+# 通用：编译 / 运行
+# ==========================================
+def pch_dir(std, opt_level):
+    return f"{settings.JUDGE_PCH_ROOT}/{std}{opt_level}"
+
+
+def pch_include_args(code, std, flags):
+    """
+    源码第一个 #include 是 <bits/stdc++.h> 且编译选项与某份预编译头一致时，
+    返回 -I 参数让 g++ 优先命中 .gch；否则返回空列表 (退回普通编译)
+    -march/-flto 等会改变预定义宏的选项不使用预编译头
+    """
+    if not settings.JUDGE_PCH_ENABLED:
+        return []
+    first_include = _FIRST_INCLUDE_RE.search(code)
+    if not first_include or first_include.group(1).strip() != PCH_HEADER:
+        return []
+
+    opt_level = flags[0] if len(flags) == 1 else ("-O0" if not flags else None)
+    if opt_level not in PCH_OPT_LEVELS:
+        return []
+    return ["-I", pch_dir(std, opt_level)]
+
+
+def build_pch_script(stds=None, opt_levels=PCH_OPT_LEVELS):
+    """生成在沙箱容器内构建预编译头的 shell 脚本 (供 start_gojudge 使用)"""
+    lines = [
+        "set -e",
+        f"HDR=$(find /usr/include -path '*/{PCH_HEADER}' | head -n 1)",
+        'if [ -z "$HDR" ]; then echo "bits/stdc++.h not found" >&2; exit 1; fi',
+    ]
+    for std in stds or STD_MAP.values():
+        for opt_level in opt_levels:
+            target = pch_dir(std, opt_level)
+            lines += [
+                f"mkdir -p {target}/bits",
+                f"cp \"$HDR\" {target}/bits/",
+                f"echo 'building {target}'",
+                f"{CPP_COMPILER} -std={std} {opt_level} -x c++-header \"$HDR\" -o {target}/{PCH_HEADER}.gch",
+            ]
+    return "\n".join(lines)
+
+
+async def compile_cpp(client, code, flags=("-O2",), std=DEFAULT_CPP_STD, src_name="main.cpp", exe_name="main",
+                      use_pch=True):
+    """
+    编译 C++ 源码并把可执行文件缓存在 Go-Judge 中
+    返回: (file_id, error, 原始编译结果)
+    """
+    flags = tuple(flags)
+    pch_args = pch_include_args(code, std, flags) if use_pch else []
+    payload = {
+        "cmd": [{
+            "args": [CPP_COMPILER, src_name, f"-std={std}", "-o", exe_name, *flags, *pch_args],
+            "env": ["PATH=/usr/bin:/bin"],
+            "files": [
+                {"content": ""},
+                {"name": "stdout", "max": 10240},
+                {"name": "stderr", "max": 10240}
+            ],
+            "cpuLimit": 10000000000,  # 10秒编译时间
+            "memoryLimit": settings.MEMORY_LIMIT_BYTES,
+            "procLimit": 10,
+            "copyIn": {src_name: {"content": code}},
+            "copyOutCached": [exe_name]
+        }]
+    }
+    res = await client.post(f"{settings.GO_JUDGE_BASE_URL}/run", json=payload)
+    if res.status_code != 200:
+        return None, f"Judge Server Error: {res.text}", None
+
+    result = res.json()[0]
+    if result['status'] != 'Accepted':
+        return None, result.get('files', {}).get('stderr', '编译失败，未知错误'), result
+
+    file_id = result.get('fileIds', {}).get(exe_name)
+    if not file_id:
+        return None, "编译成功但未生成可执行文件", result
+    return file_id, None, result
+
+
+async def run_cpp_binary(client, file_id, input_data, exe_name="main",
+                         cpu_limit=2000000000, output_max=1024 * 1024, input_file_id=None):
+    """
+    用缓存的可执行文件运行一次，返回 Go-Judge 的原始结果
+    传入 input_file_id 时直接以沙箱中缓存的文件作为 stdin，不再随请求传输输入内容
+    """
+    stdin = {"fileId": input_file_id} if input_file_id else {"content": input_data}
+    payload = {
+        "cmd": [{
+            "args": [f"./{exe_name}"],
+            "env": ["PATH=/usr/bin:/bin"],
+            "files": [
+                stdin,
+                {"name": "stdout", "max": output_max},
+                {"name": "stderr", "max": output_max}
+            ],
+            "cpuLimit": cpu_limit,
+            "memoryLimit": settings.MEMORY_LIMIT_BYTES,
+            "stackLimit": settings.MEMORY_LIMIT_BYTES,
+            "procLimit": 6,
+            "copyIn": {exe_name: {"fileId": file_id}}
+        }]
+    }
+    res = await client.post(f"{settings.GO_JUDGE_BASE_URL}/run", json=payload)
+    return res.json()[0]
+
+
+async def upload_cached_file(client, content, name="case.in"):
+    """把文件上传到 Go-Judge 缓存，返回 file_id (失败返回 None)"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    res = await client.post(f"{settings.GO_JUDGE_BASE_URL}/file", files={"file": (name, content)})
+    if res.status_code != 200:
+        logger.warning(f"upload_cached_file failed: HTTP {res.status_code} {res.text[:200]}")
+        return None
+    return res.json()
+
+
+async def delete_cached_files(client, *file_ids):
+    """删除 Go-Judge 中缓存的文件，忽略失败"""
+    for file_id in file_ids:
+        if not file_id:
+            continue
+        try:
+            await client.delete(f"{settings.GO_JUDGE_BASE_URL}/file/{file_id}")
+        except Exception:
+            pass
+
+
+# ==========================================
+# 基准测试：重复运行 + 统计
+# ==========================================
+def resolve_cpp_std(std):
+    """把前端传来的 11/14/17/20 转成 -std 参数，非法值回退到默认标准"""
+    try:
+        return STD_MAP.get(int(std), DEFAULT_CPP_STD)
+    except (TypeError, ValueError):
+        return DEFAULT_CPP_STD
+
+
+async def get_cached_file_size(client, file_id):
+    """只请求 1 个字节，通过 Content-Range 拿到缓存文件的总大小"""
+    try:
+        res = await client.get(f"{settings.GO_JUDGE_BASE_URL}/file/{file_id}", headers={"Range": "bytes=0-0"})
+        content_range = res.headers.get('content-range', '')
+        if res.status_code == 206 and '/' in content_range:
+            return int(content_range.split('/')[-1])
+        if res.status_code == 200:
+            return int(res.headers.get('content-length', len(res.content)))
+    except Exception:
+        pass
+    return None
+
+
+def summarize_samples(samples):
+    """
+    计算一组采样的统计量 (min / median / p90 / mean / stdev / cv)
+    p90 使用 nearest-rank 算法，样本少时不做插值
+    """
+    values = sorted(samples)
+    if not values:
+        return {"min": 0, "median": 0, "p90": 0, "mean": 0, "stdev": 0, "cv": 0}
+
+    mean = statistics.fmean(values)
+    stdev = statistics.stdev(values) if len(values) > 1 else 0.0
+    p90 = values[max(0, math.ceil(0.9 * len(values)) - 1)]
+    return {
+        "min": round(values[0], 3),
+        "median": round(statistics.median(values), 3),
+        "p90": round(p90, 3),
+        "mean": round(mean, 3),
+        "stdev": round(stdev, 3),
+        "cv": round(stdev / mean, 4) if mean else 0,
+    }
+
+
+def _variance_warnings(label, stats):
+    warnings = []
+    for metric, name in (("cpu_ms", "CPU 时间"), ("wall_ms", "墙钟时间")):
+        cv = stats[metric]["cv"]
+        if cv > HIGH_VARIANCE_CV:
+            warnings.append(f"{label}{name}波动过大 (CV={cv * 100:.1f}%)，结果仅供参考，建议增加运行次数或加大输入规模")
+    return warnings
+
+
+async def benchmark_cpp(code, input_data, repeat=5, baseline_code=None, use_o2=True, std=14):
+    """
+    基准测试：编译后在同一输入上重复运行 repeat 次
+    若提供 baseline_code，则与基准程序交替运行 (ABBA 顺序)，抵消机器负载漂移
+    返回: (报告字典, error)
+    """
+    repeat = max(1, min(int(repeat), BENCHMARK_MAX_REPEAT))
+    flags = ("-O2",) if use_o2 else ()
+    std = resolve_cpp_std(std)
+    programs = {"target": code}
+    if baseline_code:
+        programs["baseline"] = baseline_code
+
+    async with judge_client(timeout=60.0) as client:
+        names = list(programs)
+        compiled = await asyncio.gather(*[compile_cpp(client, programs[name], flags=flags, std=std) for name in names])
+        file_ids = {name: res[0] for name, res in zip(names, compiled)}
+        try:
+            for name, (file_id, error, _) in zip(names, compiled):
+                if not file_id:
+                    return None, f"[{name}] {error}"
+
+            samples = {name: {"cpu_ms": [], "wall_ms": [], "memory_kb": []} for name in names}
+            for i in range(repeat):
+                # 交替顺序：奇数轮倒序，避免总是某个程序先跑
+                order = names if i % 2 == 0 else names[::-1]
+                for name in order:
+                    result = await run_cpp_binary(client, file_ids[name], input_data)
+                    if result['status'] != 'Accepted':
+                        return None, f"[{name}] 第 {i + 1} 次运行失败: {result['status']} {result['files'].get('stderr', '')}"
+                    samples[name]["cpu_ms"].append(result.get('time', 0) / 1000000)
+                    samples[name]["wall_ms"].append(result.get('runTime', 0) / 1000000)
+                    samples[name]["memory_kb"].append(result.get('memory', 0) / 1024)
+        finally:
+            await delete_cached_files(client, *file_ids.values())
+
+    report = {"repeat": repeat, "warnings": []}
+    for name in names:
+        stats = {metric: summarize_samples(values) for metric, values in samples[name].items()}
+        report[name] = stats
+        report["warnings"] += _variance_warnings("基准程序" if name == "baseline" else "", stats)
+
+    if baseline_code:
+        target_cpu, baseline_cpu = report["target"]["cpu_ms"], report["baseline"]["cpu_ms"]
+        report["speedup"] = round(baseline_cpu["median"] / target_cpu["median"], 3) if target_cpu["median"] else None
+        noise = max(target_cpu["stdev"], baseline_cpu["stdev"])
+        if abs(baseline_cpu["median"] - target_cpu["median"]) <= noise:
+            report["warnings"].append("两者中位数差异在噪声范围内，无法判断优化是否有效")
+    return report, None
+
+
+# ==========================================
+# 编译选项对比：多档位并行编译 + 同一输入运行
+# ==========================================
+async def _compile_profile(sem, client, code, profile, std):
+    async with sem:
+        file_id, error, result = await compile_cpp(client, code, flags=COMPILE_PROFILES[profile], std=std)
+    row = {
+        "profile": profile,
+        "flags": " ".join(COMPILE_PROFILES[profile]),
+        "file_id": file_id,
+        "error": error,
+        "compile_ms": round((result or {}).get('runTime', 0) / 1000000, 1),
+        "binary_kb": None,
+    }
+    if file_id:
+        size = await get_cached_file_size(client, file_id)
+        row["binary_kb"] = round(size / 1024, 1) if size is not None else None
+    return row
+
+
+async def compare_compile_profiles(code, input_data, profiles=None, std=14, repeat=3):
+    """
+    用多组编译选项编译同一份代码，并在同一输入上运行
+    编译并行 (受 COMPILE_PARALLELISM 限制)，运行串行以免互相干扰计时
+    返回: 每个档位一行的对比表
+    """
+    profiles = [p for p in (profiles or DEFAULT_COMPARE_PROFILES) if p in COMPILE_PROFILES]
+    profiles = list(dict.fromkeys(profiles)) or DEFAULT_COMPARE_PROFILES
+    repeat = max(1, min(int(repeat), BENCHMARK_MAX_REPEAT))
+    std_flag = resolve_cpp_std(std)
+
+    async with judge_client(timeout=60.0) as client:
+        sem = asyncio.Semaphore(COMPILE_PARALLELISM)
+        rows = await asyncio.gather(*[_compile_profile(sem, client, code, p, std_flag) for p in profiles])
+        try:
+            reference_output = None
+            for row in rows:
+                row.update({"status": "Compile Error", "time_ms": None, "wall_ms": None,
+                            "memory_kb": None, "output_matches": None})
+                if not row["file_id"]:
+                    continue
+
+                cpu_samples, wall_samples, memory_samples = [], [], []
+                for _ in range(repeat):
+                    result = await run_cpp_binary(client, row["file_id"], input_data)
+                    row["status"] = result['status']
+                    if result['status'] != 'Accepted':
+                        row["error"] = result['files'].get('stderr', '')
+                        break
+                    cpu_samples.append(result.get('time', 0) / 1000000)
+                    wall_samples.append(result.get('runTime', 0) / 1000000)
+                    memory_samples.append(result.get('memory', 0) / 1024)
+                else:
+                    row["time_ms"] = summarize_samples(cpu_samples)["median"]
+                    row["wall_ms"] = summarize_samples(wall_samples)["median"]
+                    row["memory_kb"] = summarize_samples(memory_samples)["median"]
+                    # 不同优化级别输出不一致，通常意味着未定义行为
+                    output = result['files'].get('stdout', '')
+                    if reference_output is None:
+                        reference_output = output
+                    row["output_matches"] = output == reference_output
+        finally:
+            await delete_cached_files(client, *[row["file_id"] for row in rows])
+
+    for row in rows:
+        row.pop("file_id", None)
+    return {"std": std_flag, "repeat": repeat, "rows": rows}
+
+
+def _driver_payload(gen_code, val_code, seed, scale, cache_input=True):
+    """生成 + 校验 (Driver 模式) 的沙箱请求"""
+    copy_in = {
+        "driver.py": {"content": DRIVER_SCRIPT},
+        "gen.py": {"content": gen_code}
+    }
+    if val_code and val_code.strip():
+        copy_in["val.py"] = {"content": val_code}
+
+    cmd = {
+        "args": ["python3", "driver.py", str(seed), str(scale)],
+        "env": ["PATH=/usr/bin:/bin"],
+        "files": [
+            {"content": ""},
+            {"name": "stdout", "max": 1024},
+            {"name": "stderr", "max": 4096}  # 捕获 Driver 的报错信息
+        ],
+        "cpuLimit": 15000000000,
+        "memoryLimit": settings.MEMORY_LIMIT_BYTES,
+        "procLimit": 20,
+        "copyIn": copy_in,
+    }
+    if cache_input:
+        cmd["copyOutCached"] = ["case.in"]  # 缓存生成的输入文件
+    return {"cmd": [cmd]}
+
+
+async def dry_run_generator(gen_code, val_code, seed=1, scale=0):
+    """
+    用小规模参数试跑一次生成器 + 校验器，不缓存数据、不运行标程
+    返回: (是否通过, 错误信息)
+    """
+    async with judge_client(timeout=30.0) as client:
+        res = await client.post(f"{settings.GO_JUDGE_BASE_URL}/run",
+                                json=_driver_payload(gen_code, val_code, seed, scale, cache_input=False))
+    if res.status_code != 200:
+        return False, f"Judge Server Error: HTTP {res.status_code}"
+
+    result = res.json()[0]
+    if result['status'] != 'Accepted' or result.get('exitStatus') != 0:
+        err_msg = result['files'].get('stderr', '') or f"{result['status']} (Exit Code: {result.get('exitStatus')})"
+        return False, err_msg[:800]
+    return True, None
+
+
 async def _run_pipeline_with_sem(sem, *args, **kwargs):
     """
     包装器：在运行前获取信号量锁
@@ -112,7 +473,7 @@ async def _run_pipeline_with_sem(sem, *args, **kwargs):
 
 async def batch_generate_and_run(gen_code, val_code, sol_file_id, count=5):
     # 🌟 核心修复：在当前事件循环中创建信号量，避免 EventLoop 绑定错误
-    sem = asyncio.Semaphore(3)
+    sem = asyncio.Semaphore(SANDBOX_CONCURRENCY)
 
     tasks = []
     for i in range(count):
@@ -123,33 +484,11 @@ async def batch_generate_and_run(gen_code, val_code, sol_file_id, count=5):
 
 
 async def _run_pipeline(gen_code, val_code, sol_file_id, seed, scale, index):
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    async with judge_client(timeout=30.0) as client:
         # ==========================================
         # Step 1: 生成 + 校验 + 保存 (Driver 模式)
         # ==========================================
-        copy_in = {
-            "driver.py": {"content": DRIVER_SCRIPT},
-            "gen.py": {"content": gen_code}
-        }
-        if val_code and val_code.strip():
-            copy_in["val.py"] = {"content": val_code}
-
-        gen_payload = {
-            "cmd": [{
-                "args": ["python3", "driver.py", str(seed), str(scale)],
-                "env": ["PATH=/usr/bin:/bin"],
-                "files": [
-                    {"content": ""},
-                    {"name": "stdout", "max": 1024},
-                    {"name": "stderr", "max": 4096}  # 捕获 Driver 的报错信息
-                ],
-                "cpuLimit": 15000000000,
-                "memoryLimit": settings.MEMORY_LIMIT_BYTES,
-                "procLimit": 20,
-                "copyIn": copy_in,
-                "copyOutCached": ["case.in"]  # 缓存生成的输入文件
-            }]
-        }
+        gen_payload = _driver_payload(gen_code, val_code, seed, scale)
 
         input_file_id = None
         try:
@@ -280,7 +619,10 @@ async def _run_pipeline(gen_code, val_code, sol_file_id, seed, scale, index):
                 "seed": seed,
                 "status": sol_data['status'],
                 "time": sol_data.get('time', 0) // 1000000,
+                "time_us": sol_data.get('time', 0) // 1000,  # 复杂度拟合需要更高精度
                 "memory": sol_data.get('memory', 0) // 1024,
+                "n": parse_input_size(preview_content),
+                "input_bytes": total_size,
                 "input_preview": input_preview,
                 "output_preview": output_preview,
                 "full_input": input_full_str,
@@ -302,7 +644,7 @@ def _make_error_result(idx, seed, status, msg):
     msg_str = str(msg) if msg is not None else ""
     return {
         "id": idx, "seed": seed, "status": status,
-        "time": 0, "memory": 0,
+        "time": 0, "time_us": 0, "memory": 0, "n": None, "input_bytes": 0,
         "input_preview": "N/A", "output_preview": msg_str,
         "full_input": "", "full_output": ""
     }
\ No newline at end of file
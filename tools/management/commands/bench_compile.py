@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+import httpx
+from django.core.management.base import BaseCommand
+
+from tools.judge_utils import compile_cpp, delete_cached_files, summarize_samples, resolve_cpp_std
+
+SAMPLE_CODE = r"""#include <bits/stdc++.h>
+using namespace std;
+
+int main() {
+    int n;
+    cin >> n;
+    vector<long long> a(n);
+    for (auto &x : a) cin >> x;
+    sort(a.begin(), a.end());
+    cout << accumulate(a.begin(), a.end(), 0LL) << endl;
+    return 0;
+}
+"""
+
+
+class Command(BaseCommand):
+    help = '对比使用/不使用预编译头时的 C++ 编译延迟'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='每种模式编译次数')
+        parser.add_argument('--std', type=int, default=14, help='C++ 标准 (11/14/17/20)')
+        parser.add_argument('--no-o2', action='store_true', help='不开启 -O2')
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run_bench(options['repeat'], resolve_cpp_std(options['std']), not options['no_o2']))
+
+    async def run_bench(self, repeat, std, use_o2):
+        flags = ("-O2",) if use_o2 else ()
+        self.stdout.write(f"编译样例 {repeat} 次 (-std={std} {' '.join(flags)}) ...")
+
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            for use_pch in (False, True):
+                wall_samples, sandbox_samples = [], []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    file_id, error, result = await compile_cpp(client, SAMPLE_CODE, flags=flags, std=std,
+                                                               use_pch=use_pch)
+                    wall_samples.append((time.perf_counter() - start) * 1000)
+                    if not file_id:
+                        self.stdout.write(self.style.ERROR(f"编译失败: {error}"))
+                        return
+                    sandbox_samples.append(result.get('runTime', 0) / 1000000)
+                    await delete_cached_files(client, file_id)
+
+                label = "使用预编译头" if use_pch else "普通编译"
+                wall, sandbox = summarize_samples(wall_samples), summarize_samples(sandbox_samples)
+                self.stdout.write(self.style.SUCCESS(
+                    f"[{label}] 端到端 median={wall['median']:.0f}ms min={wall['min']:.0f}ms | "
+                    f"沙箱内 median={sandbox['median']:.0f}ms p90={sandbox['p90']:.0f}ms"
+                ))
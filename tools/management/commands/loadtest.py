@@ -0,0 +1,76 @@
+import asyncio
+import json
+import time
+
+import httpx
+from django.core.management.base import BaseCommand
+
+from tools.judge_utils import summarize_samples
+
+DEFAULT_PATH = '/tools/api/run-cpp/'
+DEFAULT_PAYLOAD = {
+    "code": "#include <bits/stdc++.h>\nusing namespace std;\nint main(){long long n,s=0;cin>>n;"
+            "for(long long i=0;i<n;i++)s+=i;cout<<s<<endl;}",
+    "input": "1000000",
+    "use_o2": True,
+    "std": 14,
+}
+
+
+class Command(BaseCommand):
+    help = '对同一接口压测 WSGI / ASGI 两套部署，对比吞吐与延迟'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True,
+                            help='名称=根地址，可重复，例如 --target wsgi=http://127.0.0.1:8000 '
+                                 '--target asgi=http://127.0.0.1:8001')
+        parser.add_argument('--path', default=DEFAULT_PATH, help='压测的接口路径 (POST JSON)')
+        parser.add_argument('--page', default='/tools/cpp/', help='先访问该页面拿到 csrftoken / session')
+        parser.add_argument('--payload', default=None, help='请求体 JSON，默认编译运行一段求和代码')
+        parser.add_argument('-c', '--concurrency', type=int, default=10, help='并发连接数')
+        parser.add_argument('-n', '--requests', type=int, default=100, help='每个目标的总请求数')
+
+    def handle(self, *args, **options):
+        payload = json.loads(options['payload']) if options['payload'] else DEFAULT_PAYLOAD
+        targets = [t.split('=', 1) for t in options['target']]
+        for name, base_url in targets:
+            report = asyncio.run(self.run_target(base_url.rstrip('/'), options['page'], options['path'], payload,
+                                                 options['concurrency'], options['requests']))
+            self.print_report(name, report)
+
+    async def run_target(self, base_url, page, path, payload, concurrency, total):
+        latencies, errors = [], 0
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+            await client.get(page)
+            headers = {'X-CSRFToken': client.cookies.get('csrftoken', ''), 'Referer': base_url + page}
+            queue = asyncio.Queue()
+            for _ in range(total):
+                queue.put_nowait(None)
+
+            async def worker():
+                nonlocal errors
+                while not queue.empty():
+                    queue.get_nowait()
+                    start = time.perf_counter()
+                    try:
+                        res = await client.post(path, json=payload, headers=headers)
+                        if res.status_code != 200:
+                            errors += 1
+                    except httpx.HTTPError:
+                        errors += 1
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            await asyncio.gather(*[worker() for _ in range(concurrency)])
+            elapsed = time.perf_counter() - start
+
+        return {"elapsed": elapsed, "total": total, "errors": errors, "latency": summarize_samples(latencies)}
+
+    def print_report(self, name, report):
+        latency = report['latency']
+        self.stdout.write(self.style.SUCCESS(
+            f"[{name}] {report['total']} 个请求 / {report['elapsed']:.1f}s = {report['total'] / report['elapsed']:.1f} req/s | "
+            f"失败 {report['errors']} | 延迟 median={latency['median']:.0f}ms p90={latency['p90']:.0f}ms "
+            f"mean={latency['mean']:.0f}ms"
+        ))
@@ -1,6 +1,7 @@
 import subprocess
 import time
 from django.core.management.base import BaseCommand, CommandError
+from tools.judge_utils import build_pch_script, PCH_OPT_LEVELS
 
 
 class Command(BaseCommand):
@@ -25,6 +26,11 @@ class Command(BaseCommand):
             action='store_true',
             help='强制删除旧容器并重建 (并重新自动安装环境)'
         )
+        parser.add_argument(
+            '--pch',
+            action='store_true',
+            help='仅在已有容器内 (重新) 生成 bits/stdc++.h 预编译头'
+        )
 
     def handle(self, *args, **options):
         container_name = "go-judge"
@@ -39,6 +45,13 @@ class Command(BaseCommand):
         result = subprocess.run(check_cmd, capture_output=True, text=True)
         exists = result.stdout.strip() == container_name
 
+        if options['pch']:
+            if not exists:
+                raise CommandError("容器不存在，请先运行 `python manage.py start_gojudge`")
+            subprocess.run(["docker", "start", container_name], check=True)
+            self.build_precompiled_headers(container_name)
+            return
+
         # 2. 判断逻辑
         if exists:
             if options['force']:
@@ -125,7 +138,25 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS("\n🎉🎉🎉 环境自动初始化完成！"))
             self.stdout.write(self.style.SUCCESS(f"已安装环境: {packages_str}"))
 
+            # 步骤 5: 生成预编译头
+            self.build_precompiled_headers(container_name)
+
         except subprocess.CalledProcessError as e:
             self.stdout.write(self.style.ERROR(f"❌ 环境安装失败: {e}"))
             self.stdout.write(
-                self.style.WARNING("请尝试运行 `python manage.py start_gojudge --force` 重试，或检查服务器网络。"))
\ No newline at end of file
+                self.style.WARNING("请尝试运行 `python manage.py start_gojudge --force` 重试，或检查服务器网络。"))
+
+    def build_precompiled_headers(self, container_name):
+        """
+        在容器内为每个 -std 和优化级别组合生成 bits/stdc++.h 的预编译头
+        每份约 80MB，编译时命中可省掉大部分头文件解析时间
+        """
+        levels_str = ", ".join(PCH_OPT_LEVELS)
+        self.stdout.write(self.style.WARNING(f"⚡️ 开始生成预编译头 (优化级别: {levels_str})..."))
+        try:
+            cmd_pch = ["docker", "exec", container_name, "sh", "-c", build_pch_script()]
+            subprocess.run(cmd_pch, check=True)
+            self.stdout.write(self.style.SUCCESS("✅ 预编译头生成完成！"))
+        except subprocess.CalledProcessError as e:
+            self.stdout.write(self.style.ERROR(f"❌ 预编译头生成失败: {e}"))
+            self.stdout.write(self.style.WARNING("编译会自动回退到普通模式，可稍后运行 `python manage.py start_gojudge --pch` 重试。"))
@@ -0,0 +1,163 @@
+# tools/matrix.py
+"""
+数据强度矩阵：多份候选程序 (暴力 / 贪心 / 溢出版本等) × 同一份测试数据
+输入只上传一次，每份程序只编译一次，(程序 × 测试点) 的运行在全局并发上限内展开
+"""
+import asyncio
+
+from .calibration import read_case_input, host_time_limit, measure_speed_baseline
+from .clients import judge_client
+from .judge_utils import (
+    compile_cpp, run_cpp_binary, upload_cached_file, delete_cached_files,
+    resolve_cpp_std, COMPILE_PARALLELISM, SANDBOX_CONCURRENCY,
+)
+
+MATRIX_MAX_CANDIDATES = 8
+DEFAULT_MATRIX_TL_MS = 1000  # 没有校准清单时使用的时限
+TL_HEADROOM = 1.5  # 沙箱 CPU 上限放宽到时限的 1.5 倍，便于看出超时程度
+MATRIX_OUTPUT_MAX = 64 * 1024 * 1024
+
+# Go-Judge 状态 -> 简写判题结果
+VERDICTS = {
+    "Accepted": "AC",
+    "Time Limit Exceeded": "TLE",
+    "Memory Limit Exceeded": "MLE",
+    "Output Limit Exceeded": "OLE",
+    "Nonzero Exit Status": "RE",
+    "Signalled": "RE",
+}
+
+
+def outputs_match(output, expected):
+    """忽略行尾空白与多余空行，按 token 比较"""
+    return output.split() == expected.split()
+
+
+def judge_cell(result, expected, time_limit_ms):
+    """把一次运行结果判为 AC / WA / TLE / MLE / RE ..."""
+    time_ms = result.get('time', 0) / 1000000
+    cell = {
+        "time_ms": round(time_ms, 1),
+        "memory_kb": result.get('memory', 0) // 1024,
+    }
+    verdict = VERDICTS.get(result['status'], "SE")
+    if verdict == "AC":
+        if time_ms > time_limit_ms:
+            verdict = "TLE"
+        elif not outputs_match(result['files'].get('stdout', ''), expected):
+            verdict = "WA"
+    cell["verdict"] = verdict
+    return cell
+
+
+def _normalize_candidates(candidates):
+    """去掉空代码、截断数量，并保证名字唯一"""
+    normalized, seen = [], set()
+    for i, item in enumerate(candidates or []):
+        code = (item.get('code') or '').strip()
+        if not code:
+            continue
+        name = (item.get('name') or '').strip() or f"程序{i + 1}"
+        while name in seen:
+            name += "'"
+        seen.add(name)
+        normalized.append({"name": name, "code": code})
+    return normalized[:MATRIX_MAX_CANDIDATES]
+
+
+async def _resolve_time_limit(client, manifest):
+    """有校准清单时按当前评测机速度换算时限，否则使用默认值"""
+    if manifest:
+        baseline_ms, error = await measure_speed_baseline(client)
+        if not error:
+            return host_time_limit(manifest, baseline_ms), "manifest"
+    return DEFAULT_MATRIX_TL_MS, "default"
+
+
+async def _compile_candidate(sem, client, candidate, std, index):
+    async with sem:
+        file_id, error, _ = await compile_cpp(client, candidate["code"], std=std,
+                                              src_name=f"c{index}.cpp", exe_name=f"c{index}")
+    return file_id, error
+
+
+async def _run_cell(sem, client, file_id, exe_name, input_id, expected, time_limit_ms):
+    async with sem:
+        result = await run_cpp_binary(client, file_id, None, exe_name=exe_name,
+                                      cpu_limit=int(time_limit_ms * TL_HEADROOM * 1000000),
+                                      output_max=MATRIX_OUTPUT_MAX, input_file_id=input_id)
+    return judge_cell(result, expected, time_limit_ms)
+
+
+async def run_matrix(cases, candidates, manifest=None, std=14):
+    """
+    cases: 测试数据缓存中的 cases 列表 (含 id / input / output)
+    candidates: [{"name": ..., "code": ...}, ...]
+    返回: (报告字典, error)
+    """
+    candidates = _normalize_candidates(candidates)
+    if not candidates:
+        return None, "请至少提供一份候选程序"
+    if not cases:
+        return None, "没有可用的 Accepted 测试点"
+    std = resolve_cpp_std(std)
+
+    async with judge_client(timeout=60.0) as client:
+        time_limit_ms, tl_source = await _resolve_time_limit(client, manifest)
+
+        compile_sem = asyncio.Semaphore(COMPILE_PARALLELISM)
+        compiled = await asyncio.gather(*[
+            _compile_candidate(compile_sem, client, c, std, i) for i, c in enumerate(candidates)
+        ])
+
+        input_ids = {}
+        try:
+            # 输入只上传一次，所有程序共享同一份缓存文件
+            for item in cases:
+                content = read_case_input(item)
+                if content is None:
+                    return None, f"测试点 #{item['id']} 的输入已过期，请重新生成数据"
+                input_ids[item['id']] = await upload_cached_file(client, content, f"{item['id']}.in")
+                if not input_ids[item['id']]:
+                    return None, f"测试点 #{item['id']} 上传失败"
+
+            sem = asyncio.Semaphore(SANDBOX_CONCURRENCY)
+            jobs, slots = [], []
+            for i, (file_id, _) in enumerate(compiled):
+                if not file_id:
+                    continue
+                for item in cases:
+                    jobs.append(_run_cell(sem, client, file_id, f"c{i}", input_ids[item['id']],
+                                          item.get('output', ''), time_limit_ms))
+                    slots.append((i, item['id']))
+            cells = await asyncio.gather(*jobs)
+        finally:
+            await delete_cached_files(client, *input_ids.values(), *[file_id for file_id, _ in compiled])
+
+    grid = {slot: cell for slot, cell in zip(slots, cells)}
+    case_ids = [item['id'] for item in cases]
+    kills = {case_id: [] for case_id in case_ids}
+    rows = []
+    for i, (candidate, (file_id, error)) in enumerate(zip(candidates, compiled)):
+        row = {"name": candidate["name"], "compile_error": error, "cells": [], "killed_by": []}
+        for case_id in case_ids:
+            cell = grid.get((i, case_id), {"verdict": "CE", "time_ms": None, "memory_kb": None})
+            row["cells"].append({"case": case_id, **cell})
+            if cell["verdict"] != "AC":
+                row["killed_by"].append(case_id)
+                if file_id:
+                    kills[case_id].append(candidate["name"])
+        row["passed"] = not row["killed_by"]
+        rows.append(row)
+
+    return {
+        "std": std,
+        "time_limit_ms": time_limit_ms,
+        "tl_source": tl_source,
+        "cases": case_ids,
+        "rows": rows,
+        "kills": kills,
+        # 全部通过的候选程序：若它本应是错解，说明数据不够强
+        "survivors": [row["name"] for row in rows if row["passed"]],
+        "idle_cases": [case_id for case_id, names in kills.items() if not names],
+    }, None
@@ -0,0 +1,139 @@
+# tools/streams.py
+"""
+AI 生成过程的实时推送：
+Celery worker 把增量文本写入 Redis Stream (每个任务一条)，Web 端用 SSE 转发给浏览器
+失败事件叫 failed 而不是 error，避免和浏览器 EventSource 自带的 error 事件混淆
+Stream 里保存了完整过程，断线重连 / 重复请求的用户都可以从头回放
+"""
+import json
+import time
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from .clients import redis_client
+from .task_events import task_channel
+
+FLUSH_INTERVAL = 0.15  # 增量文本最多攒 150ms 再写一次 Redis，避免每个 token 一次 XADD
+FLUSH_CHARS = 256
+STREAM_MAXLEN = 5000
+STREAM_CONNECTION_SECONDS = 25  # 单次 SSE 连接的最长时间，到点后由浏览器带 Last-Event-ID 自动重连
+STREAM_BLOCK_MS = 5000
+
+
+def stream_key(task_id):
+    return settings.CACHE_KEYS["AI_GEN_STREAM"].format(task_id=task_id)
+
+
+class StreamPublisher:
+    """worker 端：合并增量文本后写入 Redis Stream"""
+
+    def __init__(self, task_id):
+        self.redis = get_redis_connection("default")
+        self.key = stream_key(task_id)
+        self._pending = {}
+        self._pending_chars = 0
+        self._last_flush = time.monotonic()
+
+    def publish(self, event_type, payload):
+        """立即写入一个非增量事件 (例如候选进度)"""
+        self.flush()
+        self._add(event_type, payload)
+
+    def _add(self, event_type, payload):
+        # 每次写入都顺带续期：worker 中途崩溃、没能执行 close 时 Stream 也会按时过期
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.xadd(self.key, {"type": event_type, "data": json.dumps(payload, ensure_ascii=False)},
+                  maxlen=STREAM_MAXLEN, approximate=True)
+        pipe.expire(self.key, settings.CACHE_TIMEOUTS["AI_GEN_STREAM"])
+        pipe.execute()
+
+    def delta(self, field, text):
+        self._pending[field] = self._pending.get(field, "") + text
+        self._pending_chars += len(text)
+        if self._pending_chars >= FLUSH_CHARS or time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        for field, text in self._pending.items():
+            self._add("delta", {"field": field, "text": text})
+        self._pending = {}
+        self._pending_chars = 0
+        self._last_flush = time.monotonic()
+
+    def close(self, event_type, payload):
+        """写入结束事件 (done / failed)，过期时间从这一次写入重新计算"""
+        self.flush()
+        self._add(event_type, payload)
+
+
+def format_sse(event_type, data, event_id=None):
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def relay_events(task_id, last_id="0", task_state=None):
+    """
+    Web 端：从 Redis Stream 读取事件并转成 SSE 文本 (异步生成器)
+    last_id 为浏览器重连时带回的 Last-Event-ID，从该位置之后继续读
+    task_state: 可选的 async 回调，检查任务是否已经结束 (例如 worker 崩溃没有写结束事件)
+                每次连接只在第一次空闲时检查一次，避免频繁查询结果后端
+    """
+    key = stream_key(task_id)
+    deadline = time.monotonic() + STREAM_CONNECTION_SECONDS
+    async with redis_client() as conn:
+        yield "retry: 500\n\n"
+        while time.monotonic() < deadline:
+            response = await conn.xread({key: last_id}, count=100, block=STREAM_BLOCK_MS)
+            if not response:
+                if task_state:
+                    final = await task_state()
+                    task_state = None
+                    if final:
+                        yield format_sse(final[0], json.dumps(final[1], ensure_ascii=False))
+                        return
+                yield ": ping\n\n"
+                continue
+            for event_id, fields in response[0][1]:
+                last_id = event_id.decode()
+                event_type = fields[b"type"].decode()
+                yield format_sse(event_type, fields[b"data"].decode(), last_id)
+                if event_type in ("done", "failed"):
+                    return
+
+
+async def relay_task_events(task_id, task_state):
+    """
+    Web 端：订阅任务状态频道，转成 SSE 文本 (异步生成器)
+    先订阅、再查一次当前状态，避免订阅前事件已经发出而漏掉；收到 SUCCESS / FAILURE 后结束
+    task_state: async 回调，返回 (state, payload)
+    """
+    deadline = time.monotonic() + STREAM_CONNECTION_SECONDS
+    async with redis_client() as conn:
+        pubsub = conn.pubsub()
+        try:
+            await pubsub.subscribe(task_channel(task_id))
+            yield "retry: 1000\n\n"
+
+            state, payload = await task_state()
+            yield format_sse("state", json.dumps({"state": state, **payload}, ensure_ascii=False, default=str))
+            if state in ("SUCCESS", "FAILURE"):
+                return
+
+            while time.monotonic() < deadline:
+                message = await pubsub.get_message(ignore_subscribe_messages=True,
+                                                   timeout=STREAM_BLOCK_MS / 1000)
+                if not message:
+                    yield ": ping\n\n"
+                    continue
+                data = message["data"].decode()
+                yield format_sse("state", data)
+                if json.loads(data).get("state") in ("SUCCESS", "FAILURE"):
+                    return
+        finally:
+            # 只释放订阅占用的连接，共享客户端由 lifespan 关闭
+            await pubsub.aclose()
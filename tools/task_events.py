@@ -0,0 +1,43 @@
+# tools/task_events.py
+"""
+Celery 任务状态推送：worker 在任务开始 / 成功 / 失败时通过 Redis pub/sub 发布事件，
+Web 端的 SSE 连接订阅后直接转发给浏览器，不再需要前端反复轮询 AsyncResult
+"""
+import json
+import logging
+
+from celery.signals import task_failure, task_prerun, task_success
+from django.conf import settings
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+
+def task_channel(task_id):
+    return settings.CACHE_KEYS["TASK_EVENTS"].format(task_id=task_id)
+
+
+def publish_task_event(task_id, state, **payload):
+    """发布失败只记录日志，不能影响任务本身"""
+    if not task_id:
+        return
+    try:
+        message = json.dumps({"state": state, **payload}, ensure_ascii=False, default=str)
+        get_redis_connection("default").publish(task_channel(task_id), message)
+    except Exception as e:
+        logger.warning(f"publish_task_event failed: {e}")
+
+
+@task_prerun.connect
+def _on_task_prerun(sender=None, task_id=None, **kwargs):
+    publish_task_event(task_id, "STARTED")
+
+
+@task_success.connect
+def _on_task_success(sender=None, result=None, **kwargs):
+    publish_task_event(sender.request.id, "SUCCESS", result=result)
+
+
+@task_failure.connect
+def _on_task_failure(sender=None, task_id=None, exception=None, **kwargs):
+    publish_task_event(task_id, "FAILURE", error=str(exception))
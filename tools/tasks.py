@@ -1,28 +1,76 @@
 # tools/tasks.py
+import asyncio
 from celery import shared_task
 from asgiref.sync import async_to_sync
-from .ai_utils import generate_gen_script
+from django.conf import settings
+from django.core.cache import cache
+from .ai_utils import generate_gen_script_stream, generate_first_valid
+from .judge_utils import dry_run_generator
+from .streams import StreamPublisher
+from . import task_events  # noqa: F401  注册 Celery 信号，推送任务状态
 import logging
 
 logger = logging.getLogger(__name__)
 
-@shared_task
-def task_ai_generate(description, solution, mode):
+
+async def _with_task_timeout(coro):
+    """llm 队列跑在 threads 池上，Celery 的 time_limit 不生效，由 asyncio 自己限时"""
+    return await asyncio.wait_for(coro, timeout=settings.LLM_TASK_TIMEOUT)
+
+
+@shared_task(bind=True)
+def task_ai_generate(self, description, solution, mode, digest=None, candidates=1):
     """
     Celery 异步任务：调用 AI 生成代码
+    candidates == 1: 流式生成，增量文本实时写入 Redis Stream，供前端通过 SSE 接收
+    candidates > 1: 并行生成多份候选并在沙箱中试跑，第一份通过的胜出，Stream 中推送各候选进度
+    digest 不为空时，成功结果写入缓存，并释放同一请求的“进行中”占位
     """
+    publisher = StreamPublisher(self.request.id)
     try:
-        result_dict = async_to_sync(generate_gen_script)(description, solution, mode)
-        return {
+        if candidates > 1:
+            def on_progress(index, status, detail=None):
+                publisher.publish("candidate", {"index": index, "status": status, **(detail or {})})
+
+            result_dict = async_to_sync(_with_task_timeout)(
+                generate_first_valid(description, solution, mode, candidates,
+                                     validate=dry_run_generator, on_progress=on_progress))
+        else:
+            result_dict = async_to_sync(_with_task_timeout)(
+                generate_gen_script_stream(description, solution, mode, on_delta=publisher.delta))
+        result = {
             'status': 'OK',
             'gen_code': result_dict.get('gen_code', ''),
             'val_code': result_dict.get('val_code', ''),
             'analysis': result_dict.get('analysis', ''),
-            'plan': result_dict.get('plan', '')
+            'plan': result_dict.get('plan', ''),
+            'candidate': result_dict.get('candidate'),
         }
+        # 保底结果、未通过试跑的结果都不缓存，下次仍会重新生成
+        if digest and not result_dict.get('fallback') and not result_dict.get('validation_failed'):
+            cache.set(settings.CACHE_KEYS["AI_GEN_RESULT"].format(digest=digest), result,
+                      timeout=settings.CACHE_TIMEOUTS["AI_GEN_RESULT"])
+        publisher.close("done", result)
+        return result
+    except asyncio.TimeoutError:
+        logger.warning(f"AI task timed out after {settings.LLM_TASK_TIMEOUT}s")
+        result = {
+            'status': 'Error',
+            'error': f"AI 生成超时 ({settings.LLM_TASK_TIMEOUT} 秒)，请稍后重试"
+        }
+        publisher.close("failed", result)
+        return result
     except Exception as e:
         logger.exception(f"Task Failed: {e}")
-        return {
+        result = {
             'status': 'Error',
             'error': str(e)
-        }
\ No newline at end of file
+        }
+        publisher.close("failed", result)
+        return result
+    finally:
+        if digest:
+            inflight_key = settings.CACHE_KEYS["AI_GEN_INFLIGHT"].format(digest=digest)
+            # 只删除自己的占位，避免误删之后新发起的同名任务
+            if cache.get(inflight_key) == self.request.id:
+                cache.delete(inflight_key)
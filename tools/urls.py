@@ -10,6 +10,8 @@ urlpatterns = [
     # === 工具 1: C++ 在线运行 ===
     path('cpp/', views.cpp_runner, name='cpp_runner'),
     path('api/run-cpp/', views.run_cpp_api, name='run_cpp_api'),
+    path('api/benchmark-cpp/', views.api_benchmark_cpp, name='api_benchmark_cpp'),
+    path('api/compare-profiles/', views.api_compare_profiles, name='api_compare_profiles'),
     path('api/unlock/', views.api_unlock_tool, name='api_unlock'),
 
     # === 工具 2: AI测试数据在线生成 ===
@@ -18,5 +20,9 @@ urlpatterns = [
     path('api-run-testgen/', views.api_run_testgen, name='api_run_testgen'),
     path('api/download-zip/<str:zip_id>/', views.download_testcase_zip, name='download_zip'),
     path('api/check-task/', views.api_check_task, name='api_check_task'),
+    path('api/task-stream/', views.api_task_stream, name='api_task_stream'),
+    path('api/task-events/', views.api_task_events, name='api_task_events'),
+    path('api/calibrate-tl/', views.api_calibrate_tl, name='api_calibrate_tl'),
+    path('api/run-matrix/', views.api_run_matrix, name='api_run_matrix'),
 
 ]
\ No newline at end of file
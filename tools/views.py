@@ -1,10 +1,13 @@
 from django.shortcuts import render,get_object_or_404
 import json
-import httpx
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
-from .judge_utils import compile_solution_cached, batch_generate_and_run
+from .judge_utils import (
+    compile_solution_cached, batch_generate_and_run,
+    compile_cpp, run_cpp_binary, delete_cached_files, benchmark_cpp,
+    compare_compile_profiles, resolve_cpp_std, BENCHMARK_MAX_REPEAT,
+)
 import uuid
 import zipfile
 import os
@@ -16,6 +19,13 @@ from .models import Tool
 import logging
 from django.conf import settings
 from .tasks import task_ai_generate
+from .clients import judge_client
+from .ai_utils import generation_digest, MAX_CANDIDATES
+from .streams import relay_events, relay_task_events
+from asgiref.sync import sync_to_async
+from .complexity import estimate_complexity
+from .calibration import calibrate_time_limit, DEFAULT_SAFETY_FACTOR
+from .matrix import run_matrix
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +54,22 @@ def check_tool_permission(request, tool_url_name):
 
     return tool, False  # 需要密码且未解锁
 
+
+async def acheck_tool_permission(request, tool_url_name):
+    """check_tool_permission 的异步版本，供 async 视图使用 (ORM 与 Session 都走异步接口)"""
+    tool = await Tool.objects.filter(url_name=tool_url_name).afirst()
+
+    if not tool or not tool.password:
+        return tool, True
+
+    unlocked_list = await request.session.aget('unlocked_tools', [])
+    return tool, tool.id in unlocked_list
+
+
+def _tool_locked():
+    return JsonResponse({'error': '工具已锁定，请先输入密码解锁'}, status=403)
+
+
 def tool_dashboard(request):
     """工具箱显示页"""
     tools = Tool.objects.filter(is_active=True)
@@ -54,7 +80,8 @@ def cpp_runner(request):
     """C++工具运行页面"""
     context = {
         'compiler': settings.CXX_COMPILER,
-        'memory_limit': settings.MEMORY_LIMIT_MB
+        'memory_limit': settings.MEMORY_LIMIT_MB,
+        'bench_max_repeat': BENCHMARK_MAX_REPEAT,
     }
 
     # 1. 检查权限
@@ -71,93 +98,41 @@ async def run_cpp_api(request):
     if request.method != 'POST':
         return JsonResponse({'error': 'Method not allowed'}, status=405)
 
+    _, allowed = await acheck_tool_permission(request, 'cpp_runner')
+    if not allowed:
+        return _tool_locked()
+
     try:
         data = json.loads(request.body)
         code = data.get('code', '')
         user_input = data.get('input', '')
         use_o2 = data.get('use_o2', True)
+        std = resolve_cpp_std(data.get('std', 14))
 
         if not code:
             return JsonResponse({'error': '代码不能为空'}, status=400)
 
-        async with httpx.AsyncClient() as client:
+        async with judge_client() as client:
 
             # ==========================================
-            # 第一步：编译请求
+            # 第一步：编译并缓存可执行文件
             # ==========================================
-            # 基础参数
-            compiler_args = ["/usr/bin/g++", "main.cpp", "-std=c++14", "-o", "main"]
-
-            # 如果开启了优化，追加 -O2
-            if use_o2:
-                compiler_args.append("-O2")
-            compile_payload = {
-                "cmd": [{
-                    "args": compiler_args,
-
-                    "env": ["PATH=/usr/bin:/bin"],
-                    "files": [
-                        {"content": ""},  # 0: stdin
-                        {"name": "stdout", "max": 10240},  # 1: stdout
-                        {"name": "stderr", "max": 10240}  # 2: stderr (编译错误会在这里)
-                    ],
-                    "cpuLimit": 10000000000,  # 10秒编译时间
-                    "memoryLimit": settings.MEMORY_LIMIT_BYTES,
-                    "procLimit": 10,
-                    # 关键：把代码写入文件
-                    "copyIn": {
-                        "main.cpp": {"content": code}
-                    },
-                    # 关键：缓存编译好的 'main' 文件，供下一步使用
-                    "copyOutCached": ["main"]
-                }]
-            }
-
-            res1 = await client.post(f"{settings.GO_JUDGE_BASE_URL}/run", json=compile_payload)
-            result1 = res1.json()[0]  # 拿到第一个命令的结果
-
-            # 1.1 检查编译是否成功
-            if result1['status'] != 'Accepted':
+            main_file_id, error, _ = await compile_cpp(client, code, flags=("-O2",) if use_o2 else (), std=std)
+            if not main_file_id:
                 return JsonResponse({
                     'status': 'Compile Error',
-                    'output': result1.get('files', {}).get('stderr', '编译失败，未知错误')
+                    'output': error
                 })
 
-            # 1.2 获取缓存的文件 ID
-            main_file_id = result1.get('fileIds', {}).get('main')
-            if not main_file_id:
-                return JsonResponse({'error': '编译成功但未生成可执行文件'}, status=500)
-
             # ==========================================
             # 第二步：运行请求
             # ==========================================
-            run_payload = {
-                "cmd": [{
-                    "args": ["./main"],
-                    "env": ["PATH=/usr/bin:/bin"],
-                    "files": [
-                        {"content": user_input},  # 0: 用户输入
-                        {"name": "stdout", "max": 1024 * 1024},  # 1: 运行结果
-                        {"name": "stderr", "max": 1024 * 1024}  # 2: 运行时错误
-                    ],
-                    "cpuLimit": 2000000000,  # 2秒运行时间
-                    "memoryLimit": settings.MEMORY_LIMIT_BYTES,
-                    "stackLimit": settings.MEMORY_LIMIT_BYTES,
-                    "procLimit": 6,
-                    # 关键：使用上一步的 fileId 把可执行文件拷进来
-                    "copyIn": {
-                        "main": {"fileId": main_file_id}
-                    }
-                }]
-            }
-
-            res2 = await client.post(f"{settings.GO_JUDGE_BASE_URL}/run", json=run_payload)
-            result2 = res2.json()[0]
+            result2 = await run_cpp_binary(client, main_file_id, user_input)
 
             # ==========================================
             # 第三步：清理缓存 (无论运行成功与否)
             # ==========================================
-            await client.delete(f"{settings.GO_JUDGE_BASE_URL}/file/{main_file_id}")
+            await delete_cached_files(client, main_file_id)
 
             # 组合输出
             output = result2['files'].get('stdout', '')
@@ -173,6 +148,70 @@ async def run_cpp_api(request):
         return JsonResponse({'error': "服务器错误！"}, status=500)
 
 
+async def api_benchmark_cpp(request):
+    """
+    基准测试模式：同一输入重复运行 K 次，可选与基准程序交替运行
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    _, allowed = await acheck_tool_permission(request, 'cpp_runner')
+    if not allowed:
+        return _tool_locked()
+
+    try:
+        data = json.loads(request.body)
+        code = data.get('code', '')
+        if not code:
+            return JsonResponse({'error': '代码不能为空'}, status=400)
+
+        report, error = await benchmark_cpp(
+            code,
+            data.get('input', ''),
+            repeat=int(data.get('repeat', 5)),
+            baseline_code=data.get('baseline_code') or None,
+            use_o2=data.get('use_o2', True),
+            std=data.get('std', 14),
+        )
+        if error:
+            return JsonResponse({'status': 'Error', 'output': error})
+
+        return JsonResponse({'status': 'OK', 'report': report})
+    except Exception as e:
+        logger.exception(f"api_benchmark_cpp error:  {e}")
+        return JsonResponse({'error': "服务器错误！"}, status=500)
+
+
+async def api_compare_profiles(request):
+    """
+    编译选项对比模式：同一份代码按多组编译选项编译运行，返回对比表
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    _, allowed = await acheck_tool_permission(request, 'cpp_runner')
+    if not allowed:
+        return _tool_locked()
+
+    try:
+        data = json.loads(request.body)
+        code = data.get('code', '')
+        if not code:
+            return JsonResponse({'error': '代码不能为空'}, status=400)
+
+        report = await compare_compile_profiles(
+            code,
+            data.get('input', ''),
+            profiles=data.get('profiles'),
+            std=data.get('std', 14),
+            repeat=int(data.get('repeat', 3)),
+        )
+        return JsonResponse({'status': 'OK', 'report': report})
+    except Exception as e:
+        logger.exception(f"api_compare_profiles error:  {e}")
+        return JsonResponse({'error': "服务器错误！"}, status=500)
+
+
 @require_POST
 def api_unlock_tool(request):
     """验证密码并记录 Session"""
@@ -218,17 +257,40 @@ async def api_ai_generate(request):
     if request.method != 'POST':
         return JsonResponse({'error': '405'}, status=405)
 
+    _, allowed = await acheck_tool_permission(request, 'testcase_generator')
+    if not allowed:
+        return _tool_locked()
+
     data = json.loads(request.body)
     desc = data.get('description', '')
     sol = data.get('solution', '')
     mode = data.get('mode', 'algo')
-
-    # 启动异步任务 (非阻塞)
-    # 使用 .delay() 方法，这会立刻返回一个 AsyncResult 对象
-    task = task_ai_generate.delay(desc, sol, mode)
+    regenerate = bool(data.get('regenerate'))  # 用户明确要求重新生成时跳过结果缓存
+    # 并行候选数：>1 时同时请求多份代码，第一份通过沙箱试跑的胜出
+    candidates = max(1, min(int(data.get('candidates') or 1), MAX_CANDIDATES))
+
+    digest = generation_digest(desc, sol, mode)
+    if not regenerate:
+        cached = await cache.aget(settings.CACHE_KEYS["AI_GEN_RESULT"].format(digest=digest))
+        if cached:
+            return JsonResponse({'task_id': None, 'cached': True, 'result': cached})
+
+    # 相同请求正在生成中 (双击 / 刷新页面)：直接复用同一个 task_id
+    inflight_key = settings.CACHE_KEYS["AI_GEN_INFLIGHT"].format(digest=digest)
+    task_id = str(uuid.uuid4())
+    if not await cache.aadd(inflight_key, task_id, timeout=settings.CACHE_TIMEOUTS["AI_GEN_INFLIGHT"]):
+        existing = await cache.aget(inflight_key)
+        if existing:
+            return JsonResponse({'task_id': existing, 'deduplicated': True})
+        await cache.aset(inflight_key, task_id, timeout=settings.CACHE_TIMEOUTS["AI_GEN_INFLIGHT"])
+
+    # 启动异步任务 (非阻塞)，task_id 预先生成，保证占位写入后别人就能拿到同一个 id
+    # 投递任务是同步的 Redis 调用，放到线程里执行，避免阻塞事件循环
+    await sync_to_async(task_ai_generate.apply_async)(
+        args=(desc, sol, mode), kwargs={'digest': digest, 'candidates': candidates}, task_id=task_id)
 
     # 秒回 task_id 给前端，前端去转圈圈
-    return JsonResponse({'task_id': task.id})
+    return JsonResponse({'task_id': task_id})
 
 def api_check_task(request):
     """
@@ -259,11 +321,73 @@ def api_check_task(request):
     return JsonResponse(response)
 
 
+def _task_snapshot(task_id):
+    """查询一次 Celery 任务的当前状态，返回 (state, payload)"""
+    result = AsyncResult(task_id)
+    if result.state == 'SUCCESS':
+        return 'SUCCESS', {'result': result.result}
+    if result.state == 'FAILURE':
+        return 'FAILURE', {'error': str(result.info)}
+    return result.state, {}
+
+
+def _finished_task_event(task_id):
+    """任务已经结束但 Stream 中没有结束事件时 (旧任务 / worker 崩溃)，用 Celery 结果补一个"""
+    state, payload = _task_snapshot(task_id)
+    if state == 'SUCCESS':
+        return 'done', payload['result']
+    if state == 'FAILURE':
+        return 'failed', {'status': 'Error', 'error': payload['error']}
+    return None
+
+
+async def api_task_stream(request):
+    """
+    SSE：实时转发 AI 生成过程 (analysis / plan / 代码的增量文本)
+    每次连接最多保持 STREAM_CONNECTION_SECONDS 秒，浏览器会带 Last-Event-ID 自动重连续读
+    """
+    task_id = request.GET.get('task_id')
+    if not task_id:
+        return JsonResponse({'status': 'Error', 'error': 'No task_id'}, status=400)
+
+    async def task_state():
+        return await sync_to_async(_finished_task_event)(task_id)
+
+    last_id = request.headers.get('Last-Event-ID') or '0'
+    events = relay_events(task_id, last_id, task_state=task_state)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # 关闭 Nginx 缓冲，否则事件会被攒到一起才下发
+    return response
+
+
+async def api_task_events(request):
+    """
+    SSE：推送 Celery 任务状态变化 (worker 通过 Redis pub/sub 发布)
+    取代对 api_check_task 的反复轮询，一个连接内只查询一次结果后端
+    """
+    task_id = request.GET.get('task_id')
+    if not task_id:
+        return JsonResponse({'status': 'Error', 'error': 'No task_id'}, status=400)
+
+    async def task_state():
+        return await sync_to_async(_task_snapshot)(task_id)
+
+    response = StreamingHttpResponse(relay_task_events(task_id, task_state), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # API: 运行测试并缓存结果
 async def api_run_testgen(request):
     if request.method != 'POST':
         return JsonResponse({'error': '405'}, status=405)
 
+    _, allowed = await acheck_tool_permission(request, 'testcase_generator')
+    if not allowed:
+        return _tool_locked()
+
     data = json.loads(request.body)
     sol_code = data.get('solution', '')
     gen_code = data.get('gen_code', '')
@@ -273,6 +397,9 @@ async def api_run_testgen(request):
         count = 1
     if count > 20:
         count = 20
+    # 题目数据范围上限 (可选)，用于推算最大数据下的耗时
+    max_n = int(data.get('max_n') or 0) or None
+    time_limit_ms = int(data.get('time_limit_ms') or 1000)
 
     file_id, error = await compile_solution_cached(sol_code)
     if not file_id: return JsonResponse({'status': 'Compile Error', 'error': error})
@@ -311,7 +438,8 @@ async def api_run_testgen(request):
         return JsonResponse({
             'status': 'OK',
             'results': frontend_results,  # 轻量级结果
-            'zip_id': zip_uuid  # 下载凭证
+            'zip_id': zip_uuid,  # 下载凭证
+            'complexity': estimate_complexity(results, max_n, time_limit_ms)
         })
 
     except Exception as e:
@@ -321,12 +449,79 @@ async def api_run_testgen(request):
     finally:
         # 删除编译好的标程二进制文件
         try:
-            async with httpx.AsyncClient() as client:
+            async with judge_client() as client:
                 await client.delete(f"{settings.GO_JUDGE_BASE_URL}/file/{file_id}")
         except Exception as cleanup_error:
             pass
 
 
+async def api_calibrate_tl(request):
+    """
+    时限校准：在已生成数据包中最大的几组数据上重复运行标程，
+    推荐时限并写入数据包清单 (manifest.json)
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': '405'}, status=405)
+
+    _, allowed = await acheck_tool_permission(request, 'testcase_generator')
+    if not allowed:
+        return _tool_locked()
+
+    try:
+        data = json.loads(request.body)
+        cache_key = f"testgen_zip_{data.get('zip_id', '')}"
+        cache_data = await cache.aget(cache_key)
+        if not isinstance(cache_data, dict) or not cache_data.get('solution'):
+            return JsonResponse({'status': 'Error', 'error': '数据包已过期，请重新运行测试'})
+
+        manifest, error = await calibrate_time_limit(
+            cache_data['solution'],
+            cache_data.get('cases', []),
+            repeat=int(data.get('repeat', 5)),
+            safety_factor=float(data.get('safety_factor') or DEFAULT_SAFETY_FACTOR),
+        )
+        if error:
+            return JsonResponse({'status': 'Error', 'error': error})
+
+        cache_data['manifest'] = manifest
+        await cache.aset(cache_key, cache_data, timeout=600)
+        return JsonResponse({'status': 'OK', 'manifest': manifest})
+    except Exception as e:
+        logger.exception(f"api_calibrate_tl error:  {e}")
+        return JsonResponse({'status': 'Error', 'error': "服务器错误！"}, status=500)
+
+
+async def api_run_matrix(request):
+    """
+    数据强度矩阵：多份候选程序在同一份已生成的数据上运行，返回判题结果表
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': '405'}, status=405)
+
+    _, allowed = await acheck_tool_permission(request, 'testcase_generator')
+    if not allowed:
+        return _tool_locked()
+
+    try:
+        data = json.loads(request.body)
+        cache_data = await cache.aget(f"testgen_zip_{data.get('zip_id', '')}")
+        if not isinstance(cache_data, dict):
+            return JsonResponse({'status': 'Error', 'error': '数据包已过期，请重新运行测试'})
+
+        report, error = await run_matrix(
+            cache_data.get('cases', []),
+            data.get('candidates', []),
+            manifest=cache_data.get('manifest'),
+            std=data.get('std', 14),
+        )
+        if error:
+            return JsonResponse({'status': 'Error', 'error': error})
+        return JsonResponse({'status': 'OK', 'report': report})
+    except Exception as e:
+        logger.exception(f"api_run_matrix error:  {e}")
+        return JsonResponse({'status': 'Error', 'error': "服务器错误！"}, status=500)
+
+
 def download_testcase_zip(request, zip_id):
     """根据 ID 打包下载"""
     cache_data = cache.get(f"testgen_zip_{zip_id}")
@@ -340,11 +535,13 @@ def download_testcase_zip(request, zip_id):
         gen_code = ""
         val_code = ""
         sol_code = ""  # 旧缓存可能没有
+        manifest = None
     else:
         cases = cache_data.get('cases', [])
         gen_code = cache_data.get('gen_code', '')
         val_code = cache_data.get('val_code', '')
         sol_code = cache_data.get('solution', '')  # <--- 获取标程
+        manifest = cache_data.get('manifest')  # 时限校准结果 (可选)
 
     # 用于记录需要删除的临时文件路径
     temp_files_to_clean = []
@@ -355,6 +552,7 @@ def download_testcase_zip(request, zip_id):
         if gen_code: zip_file.writestr("gen.py", gen_code)
         if val_code: zip_file.writestr("val.py", val_code)
         if sol_code: zip_file.writestr("sol.cpp", sol_code)
+        if manifest: zip_file.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
 
         # 2. 写入测试点
         for item in cases: